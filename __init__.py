@@ -5,10 +5,13 @@ This module provides functions for creating various visual effects:
 - film_strip: Create film strip effects from video sequences
 - labeled_circle: Generate labeled circular graphics
 - create_image_stack: Create image stack effects from videos
+
+profile() records where the renderers spend their time (see profiling.py).
 """
 
 from .film_strip import film_strip
 from .labeled_circle import labeled_circle
 from .image_stack import create_image_stack
+from .profiling import profile
 
-__all__ = ['film_strip', 'labeled_circle', 'create_image_stack']
\ No newline at end of file
+__all__ = ['film_strip', 'labeled_circle', 'create_image_stack', 'profile']
\ No newline at end of file
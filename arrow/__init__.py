@@ -2,6 +2,7 @@
 Arrow submodule - Generate arrows with various styles.
 """
 
-from .arrow import skia_draw_arrow
+from .arrow import skia_draw_arrow, skia_draw_arrows
+from .quiver import flow_arrows, skia_draw_quiver, skia_draw_quiver_frames
 
-__all__ = ['skia_draw_arrow']
\ No newline at end of file
+__all__ = ['skia_draw_arrow', 'skia_draw_arrows', 'flow_arrows', 'skia_draw_quiver', 'skia_draw_quiver_frames']
\ No newline at end of file
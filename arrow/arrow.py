@@ -1,11 +1,267 @@
 from rp import *
+try:
+    from ..profiling import stage
+except ImportError:  # Imported standalone from its own folder (see README), outside the package
+    from contextlib import nullcontext
+
+    def stage(name):
+        return nullcontext()
 # ------------------------------------------------------------
 # 1) Core: rp-native, composable Skia contour drawer (stroke-only)
 # ------------------------------------------------------------
+def _one_of(name, val, opts):
+    if val not in opts:
+        raise ValueError(f"{name}={val!r} not in {tuple(opts)}")
+    return val
+
+
+def _rgba_bytes(c_like):
+    return rp.float_color_to_byte_color(rp.as_rgba_float_color(c_like))
+
+
+def _dash_from_type(t, w):
+    return {
+        'solid'     : None,
+        'dashed'    : [3.5*w, 2.5*w],
+        'dotted'    : [1.0*w, 2.2*w],
+        'dashdot'   : [6.0*w, 3.0*w, 1.0*w, 3.0*w],
+        'dashdotdot': [6.0*w, 3.0*w, 1.0*w, 3.0*w, 1.0*w, 3.0*w],
+    }[t]
+
+
+class ContourStyle:
+    """
+    A compiled skia_draw_contour style: validated, with its paints and path effects built once.
+
+    Takes the same style arguments as skia_draw_contour. Reuse one style for
+    every contour drawn the same way instead of passing the arguments on
+    every call, which re-parses colors and rebuilds every paint.
+
+    EXAMPLE:
+        >>> style = ContourStyle(fill='gold', stroke_color='black', stroke_width=8, shadow=True)
+        >>> for contour in contours:
+        ...     image = skia_draw_contour(image, contour, style=style, copy=False)
+    """
+
+    def __init__(
+        self,
+        *,
+        # fill
+        fill=None,                   # None | color | True (True => use stroke_color)
+        fill_rule='winding',         # 'winding' | 'even-odd'
+        # stroke
+        stroke=True,
+        stroke_color='white',
+        stroke_width=1,
+        stroke_type='solid',         # 'solid'|'dashed'|'dotted'|'dashdot'|'dashdotdot'
+        stroke_dash=None,            # custom [on, off, ...] in px (overrides stroke_type)
+        stroke_dash_scale=1.0,
+        stroke_phase=0.0,
+        stroke_cap='round',          # 'round'|'butt'|'square'
+        stroke_join='miter',         # 'miter'|'round'|'bevel'
+        stroke_miter_limit=10,
+        stroke_align='center',       # Skia (python) exposes center-only stroking
+        # shadow
+        shadow=False,                # False|True|'fill'|'stroke'|'both'
+        shadow_dx=0.0,
+        shadow_dy=0.0,
+        shadow_blur=10.0,
+        shadow_color=(0, 0, 0, 1),
+        shadow_opacity=1.0,
+        shadow_only=False,
+        # behavior
+        antialias=True,
+        close=True,
+    ):
+        skia = rp.pip_import('skia')
+
+        # ---------- validators ----------
+        fill_rule     = _one_of('fill_rule', fill_rule, ('winding', 'even-odd'))
+        stroke_cap    = _one_of('stroke_cap', stroke_cap, ('round','butt','square'))
+        stroke_join   = _one_of('stroke_join', stroke_join, ('miter','round','bevel'))
+        stroke_type   = _one_of('stroke_type', stroke_type, ('solid','dashed','dotted','dashdot','dashdotdot'))
+        stroke_align  = _one_of('stroke_align', stroke_align, ('center',))
+        if shadow not in (False, True, 'fill', 'stroke', 'both'):
+            raise ValueError("shadow must be False|True|'fill'|'stroke'|'both'")
+
+        self.fill_rule = fill_rule
+        self.close = bool(close)
+
+        # ---------- builders ----------
+        def build_fill_paint():
+            if fill is None or fill is False:
+                return None
+            color = stroke_color if (fill is True) else fill
+            return skia.Paint(
+                AntiAlias=bool(antialias),
+                Style=skia.Paint.kFill_Style,
+                Color=skia.Color(*_rgba_bytes(color)),
+            )
+
+        def build_path_effect():
+            intervals = [float(v) for v in stroke_dash] if (stroke_dash is not None) \
+                        else _dash_from_type(stroke_type, float(stroke_width))
+            if intervals is None:
+                return None
+            intervals = [max(0.01, float(v))*float(stroke_dash_scale) for v in intervals]
+            return skia.DashPathEffect.Make(intervals, float(stroke_phase))
+
+        def build_stroke_paint():
+            if not (stroke and stroke_width and stroke_width > 0):
+                return None
+            p = skia.Paint(
+                AntiAlias=bool(antialias),
+                Style=skia.Paint.kStroke_Style,
+                StrokeWidth=float(stroke_width),
+                Color=skia.Color(*_rgba_bytes(stroke_color)),
+            )
+            p.setStrokeCap({'butt': skia.Paint.kButt_Cap,
+                            'round': skia.Paint.kRound_Cap,
+                            'square': skia.Paint.kSquare_Cap}[stroke_cap])
+            p.setStrokeJoin({'miter': skia.Paint.kMiter_Join,
+                             'round': skia.Paint.kRound_Join,
+                             'bevel': skia.Paint.kBevel_Join}[stroke_join])
+            p.setStrokeMiter(float(stroke_miter_limit))
+            pe = build_path_effect()
+            if pe is not None:
+                p.setPathEffect(pe)
+            return p
+
+        def build_shadow_paint(base_paint):
+            if not base_paint or not shadow:
+                return None
+            target = 'both' if shadow is True else str(shadow)
+            sc = list(rp.as_rgba_float_color(shadow_color))
+            sc[3] = max(0.0, min(1.0, sc[3]*float(shadow_opacity)))
+            shadow_rgba = rp.float_color_to_byte_color(tuple(sc))
+            filt = skia.ImageFilters.DropShadow(
+                float(shadow_dx), float(shadow_dy),
+                float(shadow_blur), float(shadow_blur),
+                skia.Color(*shadow_rgba), None, None
+            )
+            caster = skia.Paint(base_paint)
+            caster.setColor(skia.Color(*shadow_rgba))
+            q = skia.Paint(caster)
+            q.setImageFilter(filt)
+            return (target, q, caster, filt)
+
+        # ---------- assemble passes ----------
+        self.fill_paint   = build_fill_paint()
+        self.stroke_paint = build_stroke_paint()
+
+        self.shadow_passes = []   # shadow paints, drawn before the others
+        self.shadow_casters = []  # the same without their filter, for a shared shadow layer
+        self.shadow_layer_paint = None
+        self.shadow_key = None
+        if shadow:
+            for base_paint, targets in ((self.fill_paint, ('fill', 'both')), (self.stroke_paint, ('stroke', 'both'))):
+                res = build_shadow_paint(base_paint)
+                if res and res[0] in targets:
+                    self.shadow_passes.append(res[1])
+                    self.shadow_casters.append(res[2])
+                    self.shadow_layer_paint = skia.Paint(ImageFilter=res[3])
+                    self.shadow_key = (float(shadow_dx), float(shadow_dy), float(shadow_blur), res[2].getColor())
+
+        self.paint_passes = []  # fill, then stroke
+        if not (shadow and shadow_only):
+            if self.fill_paint is not None:
+                self.paint_passes.append(self.fill_paint)
+            if self.stroke_paint is not None:
+                self.paint_passes.append(self.stroke_paint)
+
+        self.passes = self.shadow_passes + self.paint_passes  # paints, drawn in order
+
+
+# Layout of a skia.Path in writeToMemory: version, then fill type in bits 8-9
+_PATH_MEMORY_VERSION = 5
+_MOVE_VERB, _LINE_VERB, _CLOSE_VERB = 0, 1, 5
+_path_memory_ok = None
+
+
+def _path_memory(points, lengths, close, fill_type):
+    """Serialize polygons, lengths[k] points each, the way skia.Path.writeToMemory does."""
+    lengths = np.asarray(lengths)
+    verb_lengths = lengths + bool(close)
+    starts = np.cumsum(verb_lengths) - verb_lengths
+    verbs = np.full(verb_lengths.sum(), _LINE_VERB, np.uint8)
+    verbs[starts] = _MOVE_VERB
+    if close:
+        verbs[starts + lengths] = _CLOSE_VERB
+    header = np.array([_PATH_MEMORY_VERSION | (fill_type << 8), len(points), 0, len(verbs)], np.int32)
+    padding = bytes(-len(verbs) % 4)
+    return header.tobytes() + points.tobytes() + verbs.tobytes() + padding
+
+
+def contours_path(contours, close=True, fill_rule='winding'):
+    """
+    Build one skia.Path with a polygon for each (N, 2) array of points.
+
+    Equivalent to calling skia.Path.addPoly(points, close) for each contour,
+    but the path is deserialized from one buffer built with NumPy instead of
+    one Python tuple per point, so it costs about the same for 10 points or
+    10,000. Falls back to addPoly if this skia's in-memory path layout is
+    not the expected one.
+
+    Args:
+        contours: List of (N, 2) points, kept at float32 precision, or a
+            (K, N, 2) array of K contours. Empty contours are skipped.
+        close: Whether to connect each contour's last point back to its first.
+        fill_rule: 'winding' or 'even-odd'.
+
+    Returns:
+        skia.Path
+    """
+    global _path_memory_ok
+    skia = rp.pip_import('skia')
+
+    if isinstance(contours, np.ndarray) and contours.ndim == 3:
+        contours = np.ascontiguousarray(contours, dtype=np.float32)
+        points, lengths = contours.reshape(-1, 2), [contours.shape[1]] * len(contours) if contours.shape[1] else []
+    else:
+        contours = [np.asarray(contour, dtype=np.float32).reshape(-1, 2) for contour in contours]
+        contours = [contour for contour in contours if len(contour)]
+        points, lengths = (np.concatenate(contours), [len(contour) for contour in contours]) if contours else (None, [])
+    fill_type = {'winding': skia.PathFillType.kWinding,
+                 'even-odd': skia.PathFillType.kEvenOdd}[_one_of('fill_rule', fill_rule, ('winding', 'even-odd'))]
+
+    if _path_memory_ok is None:
+        reference = skia.Path(); reference.addPoly([skia.Point(1, 2), skia.Point(3, 5)], True)
+        reference.setFillType(skia.PathFillType.kEvenOdd)
+        expected = _path_memory(np.array([[1, 2], [3, 5]], np.float32), [2], True, int(skia.PathFillType.kEvenOdd))
+        _path_memory_ok = bytes(reference.writeToMemory()) == expected
+
+    path = skia.Path()
+    if lengths and _path_memory_ok:
+        if path.readFromMemory(_path_memory(points, lengths, close, int(fill_type))):
+            return path
+
+    path = skia.Path()
+    for contour in (contours if lengths else []):
+        path.addPoly([skia.Point(x, y) for x, y in contour.tolist()], bool(close))
+    path.setFillType(fill_type)
+    return path
+
+
+def contour_path(contour, close=True, fill_rule='winding'):
+    """
+    Build a skia.Path polygon from an (N, 2) array of points, like contours_path([contour]).
+
+    Args:
+        contour: (N, 2) points, kept at float32 precision.
+        close: Whether to connect the last point back to the first.
+        fill_rule: 'winding' or 'even-odd'.
+
+    Returns:
+        skia.Path
+    """
+    return contours_path([contour], close, fill_rule)
+
+
 def skia_draw_contour(
     image,
     contour,
     *,
+    style=None,                  # ContourStyle; replaces every style argument below
     # fill
     fill=None,                   # None | color | True (True => use stroke_color)
     fill_rule='winding',         # 'winding' | 'even-odd'
@@ -32,155 +288,199 @@ def skia_draw_contour(
     # behavior
     antialias=True,
     close=True,
+    shared_shadows=False,        # blur the fill and stroke shadows as one layer
     copy=True,
 ):
     """
     Composable pipeline:
-      normalize -> build path -> build paints/effects -> collect passes -> draw
+      normalize -> build path -> build paints/effects (see ContourStyle) -> draw
+
+    contour is any rp path (points are truncated to integers, as by
+    rp.as_cv_contour), or a skia.Path (see contour_path) drawn as is.
+
+    With shadow='both' and shared_shadows=True, the fill and stroke shadows
+    are drawn into one offscreen layer and blurred once (see
+    skia_draw_contours).
     """
-    import rp, numpy as np
     skia = rp.pip_import('skia')
 
-    # ---------- validators ----------
-    def _one_of(name, val, opts):
-        if val not in opts:
-            raise ValueError(f"{name}={val!r} not in {tuple(opts)}")
-        return val
-
-    fill_rule     = _one_of('fill_rule', fill_rule, ('winding', 'even-odd'))
-    stroke_cap    = _one_of('stroke_cap', stroke_cap, ('round','butt','square'))
-    stroke_join   = _one_of('stroke_join', stroke_join, ('miter','round','bevel'))
-    stroke_type   = _one_of('stroke_type', stroke_type, ('solid','dashed','dotted','dashdot','dashdotdot'))
-    stroke_align  = _one_of('stroke_align', stroke_align, ('center',))
-    if shadow not in (False, True, 'fill', 'stroke', 'both'):
-        raise ValueError("shadow must be False|True|'fill'|'stroke'|'both'")
-
-    # ---------- stage 1: normalize image & path ----------
-    img   = rp.as_rgba_image(rp.as_byte_image(image, copy=copy), copy=False)
-    img   = np.ascontiguousarray(img)
-    cnt   = rp.as_cv_contour(contour)
-    if cnt.size == 0:
+    # ---------- stage 1: style ----------
+    if style is None:
+        with stage('skia_draw_contour.paints'):
+            style = ContourStyle(
+                fill=fill, fill_rule=fill_rule,
+                stroke=stroke, stroke_color=stroke_color, stroke_width=stroke_width,
+                stroke_type=stroke_type, stroke_dash=stroke_dash, stroke_dash_scale=stroke_dash_scale,
+                stroke_phase=stroke_phase, stroke_cap=stroke_cap, stroke_join=stroke_join,
+                stroke_miter_limit=stroke_miter_limit, stroke_align=stroke_align,
+                shadow=shadow, shadow_dx=shadow_dx, shadow_dy=shadow_dy, shadow_blur=shadow_blur,
+                shadow_color=shadow_color, shadow_opacity=shadow_opacity, shadow_only=shadow_only,
+                antialias=antialias, close=close,
+            )
+
+    # ---------- stage 2: normalize image & path ----------
+    with stage('skia_draw_contour.normalize'):
+        img   = rp.as_rgba_image(rp.as_byte_image(image, copy=copy), copy=False)
+        img   = np.ascontiguousarray(img)
+        if isinstance(contour, skia.Path):
+            path = contour
+        else:
+            cnt = rp.as_cv_contour(contour)
+            if cnt.size == 0:
+                return img
+            path = contour_path(cnt.reshape(-1, 2), style.close, style.fill_rule)
+
+    if not style.passes:
         return img
 
-    pts   = [(float(x), float(y)) for (x, y) in cnt.reshape(-1, 2)]
-    path  = skia.Path(); path.addPoly(pts, bool(close))
-    path.setFillType({'winding': skia.PathFillType.kWinding,
-                      'even-odd': skia.PathFillType.kEvenOdd}[fill_rule])
+    # ---------- stage 3: draw ----------
+    with stage('skia_draw_contour.draw'):
+        surface = skia.Surface(img)
+        with surface as canvas:
+            _draw_styled_paths(canvas, [(style, path)], shared_shadows)
+
+    return img
 
-    # ---------- stage 2: builders ----------
-    def _rgba_bytes(c_like):
-        return rp.float_color_to_byte_color(rp.as_rgba_float_color(c_like))
 
-    def build_fill_paint():
-        if fill is None or fill is False:
-            return None
-        color = stroke_color if (fill is True) else fill
-        return skia.Paint(
-            AntiAlias=bool(antialias),
-            Style=skia.Paint.kFill_Style,
-            Color=skia.Color(*_rgba_bytes(color)),
-        )
+def _contour_bounds(contour):
+    """(left, top, right, bottom) of (N, 2) points or a skia.Path."""
+    if isinstance(contour, np.ndarray):
+        return (*contour.min(axis=0), *contour.max(axis=0))
+    bounds = contour.getBounds()
+    return (bounds.left(), bounds.top(), bounds.right(), bounds.bottom())
 
-    def _dash_from_type(t, w):
-        return {
-            'solid'     : None,
-            'dashed'    : [3.5*w, 2.5*w],
-            'dotted'    : [1.0*w, 2.2*w],
-            'dashdot'   : [6.0*w, 3.0*w, 1.0*w, 3.0*w],
-            'dashdotdot': [6.0*w, 3.0*w, 1.0*w, 3.0*w, 1.0*w, 3.0*w],
-        }[t]
-
-    def build_path_effect():
-        intervals = [float(v) for v in stroke_dash] if (stroke_dash is not None) \
-                    else _dash_from_type(stroke_type, float(stroke_width))
-        if intervals is None:
-            return None
-        intervals = [max(0.01, float(v))*float(stroke_dash_scale) for v in intervals]
-        return skia.DashPathEffect.Make(intervals, float(stroke_phase))
 
-    def build_stroke_paint():
-        if not (stroke and stroke_width and stroke_width > 0):
-            return None
-        p = skia.Paint(
-            AntiAlias=bool(antialias),
-            Style=skia.Paint.kStroke_Style,
-            StrokeWidth=float(stroke_width),
-            Color=skia.Color(*_rgba_bytes(stroke_color)),
-        )
-        p.setStrokeCap({'butt': skia.Paint.kButt_Cap,
-                        'round': skia.Paint.kRound_Cap,
-                        'square': skia.Paint.kSquare_Cap}[stroke_cap])
-        p.setStrokeJoin({'miter': skia.Paint.kMiter_Join,
-                         'round': skia.Paint.kRound_Join,
-                         'bevel': skia.Paint.kBevel_Join}[stroke_join])
-        p.setStrokeMiter(float(stroke_miter_limit))
-        pe = build_path_effect()
-        if pe is not None:
-            p.setPathEffect(pe)
-        return p
-
-    def build_shadow_paint(base_paint):
-        if not base_paint or not shadow:
+def _overlaps_any(bounds, others):
+    left, top, right, bottom = bounds
+    return any(
+        left <= other_right and other_left <= right and top <= other_bottom and other_top <= bottom
+        for other_left, other_top, other_right, other_bottom in others
+    )
+
+
+def _shadow_layer_bounds(casters):
+    """Bounds of everything the (path, paint) casters draw, or None if Skia can't tell."""
+    skia = rp.pip_import('skia')
+    bounds = skia.Rect.MakeEmpty()
+    for path, paint in casters:
+        if not paint.canComputeFastBounds():
             return None
-        target = 'both' if shadow is True else str(shadow)
-        sc = list(rp.as_rgba_float_color(shadow_color))
-        sc[3] = max(0.0, min(1.0, sc[3]*float(shadow_opacity)))
-        shadow_rgba = rp.float_color_to_byte_color(tuple(sc))
-        filt = skia.ImageFilters.DropShadow(
-            float(shadow_dx), float(shadow_dy),
-            float(shadow_blur), float(shadow_blur),
-            skia.Color(*shadow_rgba), None, None
-        )
-        q = skia.Paint(base_paint)
-        q.setImageFilter(filt)
-        q.setColor(skia.Color(*shadow_rgba))
-        return (target, q)
-
-    # ---------- stage 3: assemble passes ----------
-    fill_paint   = build_fill_paint()
-    stroke_paint = build_stroke_paint()
-
-    passes = []  # list of (kind, paint)
-    if shadow:
-        res = build_shadow_paint(fill_paint)
-        if res and res[0] in ('fill', 'both'):   passes.append(('path', res[1]))
-        res = build_shadow_paint(stroke_paint)
-        if res and res[0] in ('stroke', 'both'): passes.append(('path', res[1]))
-        if shadow_only:  # only the shadow passes
-            surface = skia.Surface(img)
-            with surface as canvas:
-                for _, paint in passes:
-                    canvas.drawPath(path, paint)
-            return img
+        bounds.join(paint.computeFastBounds(path.getBounds()))
+    return bounds.makeOutset(1, 1)  # antialiasing
 
-    if fill_paint is not None:
-        passes.append(('path', fill_paint))
-    if stroke_paint is not None:
-        passes.append(('path', stroke_paint))
 
-    if not passes:
-        return img
+def _draw_styled_paths(canvas, paths, shared_shadows=False):
+    """
+    Draw (ContourStyle, skia.Path) pairs in order.
 
-    # ---------- stage 4: draw ----------
-    surface = skia.Surface(img)
-    with surface as canvas:
-        for _, paint in passes:
+    With shared_shadows, the shadow passes of every path are drawn first:
+    the casters of each distinct shadow (offset, blur and color) go into one
+    offscreen layer bounded by what they cover, which Skia blurs once when
+    the layer is restored, instead of allocating and blurring a layer for
+    every shadowed drawPath.
+    """
+    if not shared_shadows:
+        for style, path in paths:
+            for paint in style.passes:
+                canvas.drawPath(path, paint)
+        return
+
+    layers = {}  # shadow_key -> (layer paint, list of (path, caster paint))
+    for style, path in paths:
+        if style.shadow_casters:
+            casters = layers.setdefault(style.shadow_key, (style.shadow_layer_paint, []))[1]
+            casters.extend((path, paint) for paint in style.shadow_casters)
+    for layer_paint, casters in layers.values():
+        canvas.saveLayer(_shadow_layer_bounds(casters), layer_paint)
+        for path, paint in casters:
             canvas.drawPath(path, paint)
+        canvas.restore()
 
-    return img
+    for style, path in paths:
+        for paint in style.paint_passes:
+            canvas.drawPath(path, paint)
 
 
-def skia_draw_contours(image, contours, **kwargs):
-    """Plural form — cascades the same pipeline per contour; copy honored once."""
-    import rp
-    first = True
-    out = image
-    for cnt in contours:
-        out = skia_draw_contour(out, cnt, copy=(kwargs.get('copy', True) if first else False), **kwargs)
-        first = False
-    if first and kwargs.get('copy', True):
-        out = rp.as_rgba_image(rp.as_byte_image(out, copy=True), copy=False)
-    return out
+def skia_draw_contours(image, contours, *, style=None, merge=True, shared_shadows=False, copy=True, **style_kwargs):
+    """
+    Batch form of skia_draw_contour: draws every contour through one Skia surface.
+
+    Args:
+        image: Image to draw on.
+        contours: List of contours (any rp path, or a skia.Path), or of
+            (contour, ContourStyle) pairs to give each contour its own style.
+        style: ContourStyle shared by contours without their own. If None,
+            one is built from style_kwargs (skia_draw_contour's arguments).
+        merge: Merge consecutive contours that share a style into one
+            skia.Path, drawn with one drawPath per paint. Overlapping strokes
+            within a merged group are then covered once, as if they were one
+            contour, instead of blended again for every contour. Filled
+            contours are only merged while their bounding boxes are disjoint,
+            since overlapping fills could cancel under either fill rule.
+            Antialiased edges may differ slightly from separate draws; pass
+            merge=False for the exact output of one skia_draw_contour per
+            contour.
+        shared_shadows: Draw every shadow before any contour, blurring all
+            shadows that look the same (offset, blur and color) as one
+            layer, so the cost no longer grows with the number of shadowed
+            contours times the blur size. Shadows then sit under every
+            contour instead of over the contours drawn before them, and
+            overlapping shadows no longer darken each other.
+        copy: Whether to draw on a copy of image.
+
+    Returns:
+        The RGBA uint8 image with every contour drawn in order.
+    """
+    skia = rp.pip_import('skia')
+
+    with stage('skia_draw_contours.paints'):
+        items = []
+        for contour in contours:
+            if isinstance(contour, tuple) and len(contour) == 2 and isinstance(contour[1], ContourStyle):
+                items.append(contour)
+            else:
+                if style is None:
+                    style = ContourStyle(**style_kwargs)
+                items.append((contour, style))
+
+    with stage('skia_draw_contours.normalize'):
+        img = rp.as_rgba_image(rp.as_byte_image(image, copy=copy), copy=False)
+        img = np.ascontiguousarray(img)
+
+        # Group consecutive contours by style, keeping draw order between groups
+        groups = []  # (style, list of (N, 2) points or skia.Path, list of fill bounds)
+        for contour, item_style in items:
+            if not isinstance(contour, skia.Path):
+                contour = rp.as_cv_contour(contour).reshape(-1, 2)
+                if not len(contour):
+                    continue
+            bounds = _contour_bounds(contour) if item_style.fill_paint is not None else None
+            if merge and groups and groups[-1][0] is item_style and (
+                bounds is None or not _overlaps_any(bounds, groups[-1][2])
+            ):
+                groups[-1][1].append(contour)
+                groups[-1][2].append(bounds)
+            else:
+                groups.append((item_style, [contour], [bounds]))
+
+        paths = []
+        for item_style, group, _ in groups:
+            if len(group) == 1 and isinstance(group[0], skia.Path):
+                paths.append((item_style, group[0]))
+                continue
+            polygons = [contour for contour in group if not isinstance(contour, skia.Path)]
+            path = contours_path(polygons, item_style.close, item_style.fill_rule)
+            for contour in group:
+                if isinstance(contour, skia.Path):
+                    path.addPath(contour)
+            paths.append((item_style, path))
+
+    with stage('skia_draw_contours.draw'):
+        surface = skia.Surface(img)
+        with surface as canvas:
+            _draw_styled_paths(canvas, paths, shared_shadows)
+
+    return img
 
 
 # ------------------------------------------------------------
@@ -306,6 +606,14 @@ def skia_grand_showcase_animation(
         out_path = os.path.splitext(out_path)[0] + ".gif"
         frames = []
 
+    # ---- compile once: the contours never change, and row 1's styles don't animate ----
+    paths = [
+        [contour_path(as_cv_contour(cnt).reshape(-1, 2), fill_rule=style_for_cell(r,c,0).get('fill_rule', 'winding'))
+         for c, cnt in enumerate(row)]
+        for r, row in enumerate(grid)
+    ]
+    static_styles = {(1, c): ContourStyle(**style_for_cell(1,c,0)) for c in range(cols)}
+
     # ---- render frames ----
     N = int(max(1, fps*seconds))
     for f in eta(range(N)):
@@ -313,9 +621,8 @@ def skia_grand_showcase_animation(
         frame = base.copy()
         for r in range(rows):
             for c in range(cols):
-                cnt = grid[r][c]
-                style = style_for_cell(r,c,t)
-                frame = skia_draw_contour(frame, cnt, copy=False, **style)
+                style = static_styles.get((r, c)) or ContourStyle(**style_for_cell(r,c,t))
+                frame = skia_draw_contour(frame, paths[r][c], style=style, copy=False)
         if not use_gif:
             try:
                 import imageio.v3 as iio
@@ -405,6 +712,15 @@ def _arrow_contours(x0,y0,x1,y1,tip_width=15,tip_height=15,tip_dimple=5, end_wid
     ]
     return gather_vars('tip stem full')
 
+def _scaled_arrow_kwargs(skia_kwargs, scale):
+    """skia_draw_arrow's default style arguments, updated by skia_kwargs, with stroke_width and shadow_blur scaled."""
+    scaled_skia_kwargs = dict(fill='translucent blue',shadow_opacity=1,shadow_color=(0,0,0,1),shadow_blur=int(2*scale),stroke_width=int(1*scale))
+    if 'stroke_width' in skia_kwargs:
+        scaled_skia_kwargs['stroke_width'] = int(skia_kwargs['stroke_width'] * scale)
+    if 'shadow_blur' in skia_kwargs:
+        scaled_skia_kwargs['shadow_blur'] = int(skia_kwargs['shadow_blur'] * scale)
+    return scaled_skia_kwargs | skia_kwargs
+
 def skia_draw_arrow(image, x0, y0, x1, y1, tip_width=15, tip_height=15, tip_dimple=5, end_width=5, start_width=3, color='black', scale=1.0, **skia_kwargs):
     """
     Draw an arrow from (x0, y0) to (x1, y1) on the given image.
@@ -442,13 +758,7 @@ def skia_draw_arrow(image, x0, y0, x1, y1, tip_width=15, tip_height=15, tip_dimp
                            end_width=scaled_end_width, 
                            start_width=scaled_start_width)
     
-    # Scale stroke_width and shadow_blur in skia_kwargs if present
-    scaled_skia_kwargs = dict(fill='translucent blue',shadow_opacity=1,shadow_color=(0,0,0,1),shadow_blur=int(2*scale),stroke_width=int(1*scale))
-    if 'stroke_width' in skia_kwargs:
-        scaled_skia_kwargs['stroke_width'] = int(skia_kwargs['stroke_width'] * scale)
-    if 'shadow_blur' in skia_kwargs:
-        scaled_skia_kwargs['shadow_blur'] = int(skia_kwargs['shadow_blur'] * scale)
-    scaled_skia_kwargs = scaled_skia_kwargs | skia_kwargs
+    scaled_skia_kwargs = _scaled_arrow_kwargs(skia_kwargs, scale)
 
     # image = skia_draw_contours(image,[arrow.stem,arrow.tip],**scaled_skia_kwargs)
     image = skia_draw_contour(image, arrow.full, **scaled_skia_kwargs)
@@ -456,6 +766,144 @@ def skia_draw_arrow(image, x0, y0, x1, y1, tip_width=15, tip_height=15, tip_dimp
     return image
 
 
+def _arrow_outlines(x0, y0, x1, y1, tip_width=15, tip_height=15, tip_dimple=5, end_width=5, start_width=3):
+    """
+    Vectorized _arrow_contours(...).full: the 7-point outlines of K arrows at once.
+
+    Every argument is a number or an array, broadcast together to (K,).
+
+    Returns:
+        (outlines, drawn): (K, 7, 2) float outlines, and a (K,) bool mask that
+        is False for arrows with zero length or non-finite coordinates, whose
+        outlines are meaningless.
+    """
+    x0, y0, x1, y1, tip_width, tip_height, tip_dimple, end_width, start_width = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in (
+            x0, y0, x1, y1, tip_width, tip_height, tip_dimple, end_width, start_width
+        ))
+    )
+    start = np.stack([x0, y0], axis=-1)
+    end = np.stack([x1, y1], axis=-1)
+
+    delta = end - start
+    mag = np.hypot(delta[:, 0], delta[:, 1])
+    drawn = np.isfinite(mag) & (mag > 0)
+    direction = delta / np.where(drawn, mag, 1)[:, None]   # normalized deltas
+    right = np.stack([-direction[:, 1], direction[:, 0]], axis=-1)  # normalized right vector
+
+    tip_left = end - right * tip_width[:, None] - direction * tip_height[:, None]
+    tip_right = end + right * tip_width[:, None] - direction * tip_height[:, None]
+    tip_dimp = end - direction * (tip_height - tip_dimple)[:, None]
+
+    outlines = np.stack([
+        tip_dimp - right * end_width[:, None] / 2,
+        start - right * start_width[:, None] / 2,
+        start + right * start_width[:, None] / 2,
+        tip_dimp + right * end_width[:, None] / 2,
+        tip_right,
+        end,
+        tip_left,
+    ], axis=1)
+    return outlines, drawn
+
+
+def skia_draw_arrows(
+    image, x0, y0, x1, y1, tip_width=15, tip_height=15, tip_dimple=5, end_width=5, start_width=3,
+    scale=1.0, style=None, merge=True, shared_shadows=False, copy=True, **skia_kwargs
+):
+    """
+    Draw many arrows at once, like skia_draw_arrow for each of them, through one Skia surface.
+
+    Args:
+        image: Input image to draw the arrows on
+        x0, y0, x1, y1: Start and end coordinates, (K,) arrays or numbers
+        tip_width, tip_height, tip_dimple, end_width, start_width: Arrow
+            dimensions as in skia_draw_arrow, numbers or (K,) arrays
+        scale: Scale factor to apply to all dimensional parameters (default: 1.0)
+        style: ContourStyle for every arrow, or a sequence of K of them. If
+            None, one is built from skia_kwargs with skia_draw_arrow's defaults.
+        merge: Fill and stroke arrows that share a style as one skia.Path,
+            in order of first use, so overlaps are covered once rather than
+            blended again. Fills never cancel: with fill_rule='winding',
+            arrows pointing the same way round are merged; with 'even-odd',
+            consecutive arrows only while their bounding boxes are disjoint.
+            Pass merge=False to draw them one by one, exactly as a loop of
+            skia_draw_arrow would.
+        shared_shadows: Blur every arrow's shadow as one layer (see skia_draw_contours)
+        copy: Whether to draw on a copy of image
+        **skia_kwargs: Additional arguments passed to ContourStyle
+
+    Returns:
+        Image with the arrows drawn on it. Arrows with zero length are skipped.
+    """
+    skia = rp.pip_import('skia')
+
+    if style is None:
+        with stage('skia_draw_arrows.paints'):
+            style = ContourStyle(**_scaled_arrow_kwargs(skia_kwargs, scale))
+
+    with stage('skia_draw_arrows.outlines'):
+        outlines, drawn = _arrow_outlines(
+            x0, y0, x1, y1,
+            tip_width=np.multiply(tip_width, scale),
+            tip_height=np.multiply(tip_height, scale),
+            tip_dimple=np.multiply(tip_dimple, scale),
+            end_width=np.multiply(end_width, scale),
+            start_width=np.multiply(start_width, scale),
+        )
+        # Truncated to integers, as skia_draw_contour does
+        outlines = outlines[drawn].astype(np.int32)
+        if isinstance(style, ContourStyle):
+            styles = [style] * len(outlines)
+        else:
+            styles = np.empty(len(style), dtype=object)
+            styles[:] = list(style)
+            if len(styles) != len(drawn):
+                raise ValueError(f"Need one style per arrow: got {len(styles)} styles for {len(drawn)} arrows")
+            styles = styles[drawn]
+
+    with stage('skia_draw_arrows.normalize'):
+        img = rp.as_rgba_image(rp.as_byte_image(image, copy=copy), copy=False)
+        img = np.ascontiguousarray(img)
+        if merge:
+            # Fills in one path cancel where they overlap under even-odd, and under
+            # winding where they are outlined in opposite directions. So winding fills
+            # are merged per direction, and even-odd fills (like skia_draw_contours)
+            # only while their bounding boxes are disjoint.
+            x, y = outlines[..., 0].astype(float), outlines[..., 1].astype(float)
+            clockwise = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1) > 0
+            bounds = np.concatenate([outlines.min(axis=1), outlines.max(axis=1)], axis=1)
+            groups = {}  # (id(style), clockwise, split) -> (style, indices of its arrows)
+            splits = {}  # id(style) -> number of times its even-odd group was split
+            for index, arrow_style in enumerate(styles):
+                key = (id(arrow_style), clockwise[index], splits.get(id(arrow_style), 0))
+                if arrow_style.fill_paint is not None and arrow_style.fill_rule == 'even-odd' and key in groups:
+                    left, top, right, bottom = bounds[index]
+                    others = bounds[groups[key][1]]
+                    if np.any((left <= others[:, 2]) & (others[:, 0] <= right) & (top <= others[:, 3]) & (others[:, 1] <= bottom)):
+                        splits[id(arrow_style)] = key[2] + 1
+                        key = key[:2] + (key[2] + 1,)
+                groups.setdefault(key, (arrow_style, []))[1].append(index)
+            paths = [
+                (arrow_style, contours_path(outlines[indices], arrow_style.close, arrow_style.fill_rule))
+                for arrow_style, indices in groups.values() if arrow_style.passes
+            ]
+        else:
+            paths = [
+                (arrow_style, contour_path(outline, arrow_style.close, arrow_style.fill_rule))
+                for outline, arrow_style in zip(outlines, styles) if arrow_style.passes
+            ]
+        if not paths:
+            return img
+
+    with stage('skia_draw_arrows.draw'):
+        surface = skia.Surface(img)
+        with surface as canvas:
+            _draw_styled_paths(canvas, paths, shared_shadows)
+
+    return img
+
+
 
 def draw(image, points):
     h, w = get_image_dimensions(image)
@@ -0,0 +1,147 @@
+"""
+Quiver plots of dense optical flow, drawn with skia_draw_arrows.
+
+A flow field is subsampled on a grid, every arrow's magnitude is mapped to a
+color and a width in one NumPy pass, and all arrows are drawn through one
+Skia surface. Colors come from a colormap sampled at num_colors levels, with
+one compiled ContourStyle per level, so arrows of the same level share one
+skia.Path.
+
+EXAMPLE:
+    >>> flow = rp.cv_optical_flow(frame_a, frame_b)   # (H, W, 2)
+    >>> image = skia_draw_quiver(frame_a, flow, stride=24, colormap='magma')
+    >>> frames = skia_draw_quiver_frames(flows, video, max_magnitude=20)   # lazy, one frame at a time
+"""
+
+import numpy as np
+
+import rp
+
+try:
+    from ..profiling import stage
+except ImportError:  # Imported standalone from its own folder (see README), outside the package
+    from contextlib import nullcontext
+
+    def stage(name):
+        return nullcontext()
+from .arrow import ContourStyle, skia_draw_arrows
+
+
+def flow_arrows(flow, stride=16, scale=1.0):
+    """
+    Subsample a flow field into arrows from grid points along the flow.
+
+    Args:
+        flow: (H, W, 2) flow field of (dx, dy) in pixels.
+        stride: Grid spacing in pixels; arrows start at the centers of
+            stride×stride cells.
+        scale: Factor the flow vectors are multiplied by.
+
+    Returns:
+        (x0, y0, x1, y1, magnitude), each a (K,) float array, where
+        magnitude is the unscaled flow magnitude at each grid point.
+    """
+    flow = np.asarray(flow)
+    if flow.ndim != 3 or flow.shape[2] != 2:
+        raise ValueError(f"flow must have shape (H, W, 2), but got shape={flow.shape}")
+    H, W = flow.shape[:2]
+    ys, xs = np.meshgrid(np.arange(stride // 2, H, stride), np.arange(stride // 2, W, stride), indexing='ij')
+    dx, dy = flow[ys, xs].astype(float).reshape(-1, 2).T
+    x0, y0 = xs.ravel().astype(float), ys.ravel().astype(float)
+    return x0, y0, x0 + dx * scale, y0 + dy * scale, np.hypot(dx, dy)
+
+
+def _quiver_styles(colormap, num_colors, skia_kwargs):
+    """One ContourStyle per colormap level, sampled at the centers of num_colors equal bins."""
+    levels = (np.arange(num_colors) + 0.5) / num_colors
+    palette = rp.apply_colormap_to_image(levels[None], colormap, backend='np')[0]
+    kwargs = dict(stroke=False) | skia_kwargs
+    return [ContourStyle(fill=tuple(map(float, color)), **kwargs) for color in palette]
+
+
+def _draw_quiver(image, flow, styles, stride, scale, max_magnitude, min_width, max_width, copy):
+    with stage('skia_draw_quiver.arrows'):
+        x0, y0, x1, y1, magnitude = flow_arrows(flow, stride, scale)
+        if max_magnitude is None:
+            max_magnitude = magnitude.max(initial=0)
+        level = np.clip(magnitude / max(float(max_magnitude), 1e-9), 0, 1)
+
+        # Tips grow with the width, but never past half the arrow's length
+        width = min_width + level * (max_width - min_width)
+        tip = np.minimum(3 * width, np.hypot(x1 - x0, y1 - y0) / 2)
+        index = np.minimum((level * len(styles)).astype(int), len(styles) - 1)
+
+    if image is None:
+        H, W = np.shape(flow)[:2]
+        image, copy = np.zeros((H, W, 4), np.uint8), False
+    return skia_draw_arrows(
+        image, x0, y0, x1, y1,
+        tip_width=tip, tip_height=tip, tip_dimple=tip / 3, end_width=width, start_width=0.6 * width,
+        style=[styles[i] for i in index],
+        copy=copy,
+    )
+
+
+def skia_draw_quiver(
+    image, flow, stride=16, *, scale=1.0, colormap='viridis', num_colors=32, max_magnitude=None,
+    min_width=1.0, max_width=4.0, copy=True, **skia_kwargs
+):
+    """
+    Draw a flow field as a grid of arrows colored and sized by magnitude.
+
+    Args:
+        image: Image to draw on, or None for a transparent (H, W, 4) canvas.
+        flow: (H, W, 2) flow field of (dx, dy) in pixels, matching image's size.
+        stride: Grid spacing in pixels (see flow_arrows).
+        scale: Factor the flow vectors are multiplied by when drawn.
+        colormap: Colormap name, anything rp.apply_colormap_to_image accepts.
+        num_colors: Number of colormap levels; arrows in the same level
+            share a color and are drawn as one path.
+        max_magnitude: Flow magnitude mapped to the end of the colormap and
+            to max_width. Defaults to the largest sampled magnitude.
+        min_width, max_width: Shaft width in pixels at zero and max_magnitude.
+        copy: Whether to draw on a copy of image.
+        **skia_kwargs: Style arguments for every arrow (see ContourStyle),
+            e.g. stroke_color='black' for outlined arrows. fill is set by
+            the colormap.
+
+    Returns:
+        The RGBA uint8 image with the arrows drawn on it.
+    """
+    styles = _quiver_styles(colormap, num_colors, skia_kwargs)
+    return _draw_quiver(image, flow, styles, stride, scale, max_magnitude, min_width, max_width, copy)
+
+
+def skia_draw_quiver_frames(
+    flows, video=None, stride=16, *, scale=1.0, colormap='viridis', num_colors=32, max_magnitude=None,
+    min_width=1.0, max_width=4.0, **skia_kwargs
+):
+    """
+    Lazily draw a quiver plot on every frame of a flow video.
+
+    flows (and video, if given) may be (T, ...) arrays or any iterables of
+    frames, such as generators or video readers. One frame of each is held
+    at a time, so memory stays bounded however long the video is. Styles
+    are built once for the whole video.
+
+    Pass max_magnitude to keep colors and widths comparable across frames;
+    otherwise every frame is normalized by its own largest magnitude.
+
+    Args:
+        flows: (T, H, W, 2) flow video, or an iterable of (H, W, 2) fields.
+        video: Frames to draw on, or None for transparent frames. Must
+            have at least as many frames as flows.
+        See skia_draw_quiver for the other arguments.
+
+    Yields:
+        RGBA uint8 frames, one per flow field.
+    """
+    styles = _quiver_styles(colormap, num_colors, skia_kwargs)
+    frames = iter(video) if video is not None else None
+    for index, flow in enumerate(flows):
+        image = None
+        if frames is not None:
+            image = next(frames, None)
+            if image is None:
+                raise ValueError(f"video ran out after {index} frames, but flows has more")
+        yield _draw_quiver(image, flow, styles, stride, scale, max_magnitude, min_width, max_width, copy=True)
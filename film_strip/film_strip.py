@@ -1,5 +1,12 @@
 from rp import *
 from functools import partial
+try:
+    from ..profiling import stage
+except ImportError:  # Imported standalone from its own folder (see README), outside the package
+    from contextlib import nullcontext
+
+    def stage(name):
+        return nullcontext()
 
 
 def film_strip(video, length=None, height=None, width=None, vertical=False, film_color='black'):
@@ -32,33 +39,39 @@ def film_strip(video, length=None, height=None, width=None, vertical=False, film
     rnd = partial(with_corner_radii, radius=20, antialias=False)
     otl = partial(with_alpha_outlines, outer_radius=20, allow_growth=True, color="gray")
 
-    if length is not None:
-        video = resize_list(video, length)
-    video = resize_images(video, size=(height, width))
-    video = rnd(video)
-    video = otl(video)
-    video = pad(video)
+    with stage('film_strip.resize'):
+        if length is not None:
+            video = resize_list(video, length)
+        video = resize_images(video, size=(height, width))
+
+    with stage('film_strip.frames'):
+        video = rnd(video)
+        video = otl(video)
+        video = pad(video)
 
-    strip = horizontally_concatenated_images(video)
-    strip = blend_images(film_color, strip)
+    with stage('film_strip.concatenate'):
+        strip = horizontally_concatenated_images(video)
+        strip = blend_images(film_color, strip)
 
     alpha = get_alpha_channel(strip)
 
-    film_dots = crop_image_zeros(
-        skia_text_to_image("• " * 1000, style="black on white", font="Arial")
-    )
-    film_dots = crop_image(film_dots, height=32, origin="center")
-    alpha = skia_stamp_image(
-        alpha, film_dots, sprite_origin="top", canvas_origin="top"
-    )
-    alpha = skia_stamp_image(
-        alpha, film_dots, sprite_origin="bottom", canvas_origin="bottom"
-    )
-    alpha = blend_images(alpha, get_image_alpha(strip), mode='multiply')
+    with stage('film_strip.holes'):
+        film_dots = crop_image_zeros(
+            skia_text_to_image("• " * 1000, style="black on white", font="Arial")
+        )
+        film_dots = crop_image(film_dots, height=32, origin="center")
+        alpha = skia_stamp_image(
+            alpha, film_dots, sprite_origin="top", canvas_origin="top"
+        )
+        alpha = skia_stamp_image(
+            alpha, film_dots, sprite_origin="bottom", canvas_origin="bottom"
+        )
+        alpha = blend_images(alpha, get_image_alpha(strip), mode='multiply')
 
-    strip = with_alpha_channel(strip, alpha)
-    strip = with_corner_radius(strip, 20)
+    with stage('film_strip.finish'):
+        strip = with_alpha_channel(strip, alpha)
+        strip = with_corner_radius(strip, 20)
 
-    strip = bordered_image_solid_color(strip, "transparent", thickness=40)
+        strip = bordered_image_solid_color(strip, "transparent", thickness=40)
 
     return strip
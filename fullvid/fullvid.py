@@ -1,12 +1,19 @@
 import rp
 from rp.r import _omni_load
 from rp.git.Figures.labeled_circle import labeled_circle
+from rp.git.Figures.profiling import stage
+from rp.git.Figures.fullvid.layer_cache import LayerCache
+from rp.git.Figures.fullvid.sparse_layer import SparseLayer, composite_layers, sprites_layer
+from rp.git.Figures.fullvid.trail_accumulator import TrailAccumulator
 from rp.git.Figures.arrow.arrow import (
     # skia_draw_contour,
     skia_draw_contours,
     skia_draw_arrow,
 )
 import numpy as np
+import functools
+import hashlib
+import os
 
 FAST_MODE=False
 # FAST_MODE=True 
@@ -61,6 +68,34 @@ N, T, H, W = rp.validate_tensor_shapes(
 # DPI scaling parameter - when set to 2, doubles resolution of everything
 DPI = 2.0
 
+def file_digest(*paths):
+    """SHA-1 of the contents of some files, to tell when their data changed."""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(2**20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+# Rendered layers are cached by name instead of by their track arrays (see layer_cache.py), in memory.
+# The track layers, which are slow to draw, are also kept in LAYER_CACHE_DIR (None to keep them in
+# memory only) and shared by every render; the directory is pruned past LAYER_CACHE_DISK_BYTES.
+# DATASET_VERSION identifies the inputs and every setting the layers depend on;
+# bump LAYER_REVISION after changing how layers are drawn, so stale layers on disk are not reused.
+LAYER_REVISION = 3
+DATASET_VERSION = (
+    file_digest(
+        counter_video_path, target_video_path,
+        counter_tracks_path, target_tracks_path,
+        counter_visibles_path, target_visibles_path,
+    ),
+    repr(indices), DPI, FAST_MODE, LAYER_REVISION,
+)
+LAYER_CACHE_BYTES = 4 * 2**30
+LAYER_CACHE_DIR = rp.path_join(os.path.expanduser('~'), '.cache', 'fullvid_layers')
+LAYER_CACHE_DISK_BYTES = 2 * 2**30
+layer_cache = LayerCache(LAYER_CACHE_BYTES, version=DATASET_VERSION, directory=LAYER_CACHE_DIR, max_disk_bytes=LAYER_CACHE_DISK_BYTES)
+
 #Only put hands where the tracks differ
 hand_numbers = list(np.argwhere(~(((counter_tracks - target_tracks)**2).mean((0,2)) < 5)).flatten())
 
@@ -96,28 +131,29 @@ circles = [
 def contig(x):
     return rp.as_rgba_image(rp.as_byte_image(x,copy=False),copy=False)
 
-@rp.memoized_lru(2048)
+@layer_cache.cached(persist=True)
 def get_circles_layer(tracks, visibles, frame_number, track_numbers=None):
     """
     EXAMPLE:
-        >>> f=[get_circles_layer(target_tracks,target_visibles,t) for t in eta(range(T))]
+        >>> f=[get_circles_layer(target_tracks,target_visibles,t,key='target').to_image() for t in eta(range(T))]
         >>> q=skia_stamp_video(target_video,f)
         >>> display_video(q)
     """
 
     if track_numbers is None: track_numbers=range(N)
-    layer = rp.uniform_byte_color_image(H_SCALED, W_SCALED)
+    sprites, positions = [], []
     
     for n in track_numbers:
         circle=circles[n]
         x,y=tracks[frame_number,n].astype(float) * DPI  # Ensure float precision
         v=visibles[frame_number,n]
         if v:
-            layer = rp.skia_stamp_image(layer,circle,offset=[float(x),float(y)], sprite_origin=[.5,.5],copy=False)
+            sprites.append(circle)
+            positions.append([x - circle.shape[1] * .5, y - circle.shape[0] * .5])
                 
-    return contig(layer)
+    return sprites_layer(sprites, positions, H_SCALED, W_SCALED)
 
-@rp.memoized_lru(2048)
+@layer_cache.cached(persist=True)
 def get_hand_layer(tracks, visibles, frame_number, grabbing=False, dx=0, dy=0, hand_size=1.0, track_numbers=None):
     """
     EXAMPLE:
@@ -127,62 +163,60 @@ def get_hand_layer(tracks, visibles, frame_number, grabbing=False, dx=0, dy=0, h
     """
 
     if track_numbers is None: track_numbers=range(N)
-    layer = rp.uniform_byte_color_image(H_SCALED, W_SCALED)
+    hand = grab_icon if grabbing else hand_icon
+    hand = contig(rp.cv_resize_image(hand, hand_size * DPI))
+    sprites, positions = [], []
     
     for n in track_numbers:
         x,y=tracks[frame_number,n].astype(float) * DPI  # Ensure float precision
         v=visibles[frame_number,n]
-        hand = grab_icon if grabbing else hand_icon
-        hand = rp.cv_resize_image(hand, hand_size * DPI)
         if v:
-            layer = rp.skia_stamp_image(layer,hand,offset=[float(x+dx*DPI),float(y+dy*DPI)], sprite_origin=[.5,.5],copy=False)
+            sprites.append(hand)
+            positions.append([x + dx*DPI - hand.shape[1] * .5, y + dy*DPI - hand.shape[0] * .5])
                 
-    return contig(layer)
+    return sprites_layer(sprites, positions, H_SCALED, W_SCALED)
+
+TRAIL_STYLE = dict(
+    stroke_width=int(4 * DPI),
+    shadow_opacity=1,
+    shadow_color=(1, 1, 1, 1),
+    shadow_blur=int(5 * DPI),
+    stroke_join='round',
+    stroke_type='dotted',
+    stroke_dash_scale=.5,
+    fill=None,
+    close=False,
+)
+TRAIL_SHADOW_BLUR = int(10 * DPI)
 
-@rp.memoized_lru(2048)
+# Accumulators of the most recently drawn trail layers, by the arrays and tracks they draw
+trail_accumulators = {}
+MAX_TRAIL_ACCUMULATORS = 8
+
+@layer_cache.cached(persist=True)
 def get_trails_layer(tracks, visibles, frame_number, track_numbers=None):
+    """
+    Trails of every track from frame 0 to frame_number.
 
+    Playing frames in order costs the same per frame however far into the
+    clip they are (see TrailAccumulator).
+    """
     if track_numbers is None: track_numbers=range(N)
-    layer = rp.uniform_byte_color_image(H_SCALED, W_SCALED)
-    
-    if frame_number>0:
-
-        for n in track_numbers:
-            color=colors[n]
-            
-            old_vis=False
-            subtrails = []
-            for t in range(frame_number+1):
-                vis = visibles[t, n]
-                xy  = tracks[t,n].astype(float) * DPI  # Ensure float precision
-                if vis and not old_vis:
-                    subtrails+=[[xy]]
-                elif vis and old_vis:
-                    subtrails[-1]+=[xy]
-                old_vis = vis
-                
-            layer = skia_draw_contours(
-                layer,
-                subtrails,
-                #
-                stroke_width=int(4 * DPI),
-                shadow_opacity=1,
-                shadow_color=(1, 1, 1, 1),
-                shadow_blur=int(5 * DPI),
-                stroke_join='round',
-                stroke_type='dotted',
-                stroke_dash_scale=.5,
-                fill=None,
-                stroke_color=color,
-                close=False,
-            )
-            
-    if not FAST_MODE:
-        layer=rp.with_drop_shadow(layer,color='black',blur=int(10 * DPI))
 
-    return contig(layer)
+    key = (id(tracks), id(visibles), tuple(track_numbers))
+    accumulator = trail_accumulators.pop(key, None)
+    if accumulator is None or accumulator.tracks is not tracks or accumulator.visibles is not visibles:
+        accumulator = TrailAccumulator(
+            tracks, visibles, track_numbers, H_SCALED, W_SCALED, colors, TRAIL_STYLE,
+            shadow_blur=None if FAST_MODE else TRAIL_SHADOW_BLUR, scale=DPI,
+        )
+    trail_accumulators[key] = accumulator  # Most recently used last
+    while len(trail_accumulators) > MAX_TRAIL_ACCUMULATORS:
+        del trail_accumulators[next(iter(trail_accumulators))]
+
+    return SparseLayer.from_image(accumulator.seek(frame_number))
 
-@rp.memoized_lru(2048)
+@layer_cache.cached(persist=True)
 def get_arrows_layer(src_tracks,src_visibles,dst_tracks,dst_visibles,frame_number,track_numbers=None,circle_radius=12):
     if track_numbers is None: track_numbers=range(N)
     layer = rp.uniform_byte_color_image(H_SCALED, W_SCALED)
@@ -230,9 +264,9 @@ def get_arrows_layer(src_tracks,src_visibles,dst_tracks,dst_visibles,frame_numbe
     if not FAST_MODE:
         layer=rp.with_drop_shadow(layer,color='black',blur=int(20 * DPI))
         
-    return contig(layer)
+    return SparseLayer.from_image(contig(layer))
 
-@rp.memoized_lru(2048)
+@layer_cache.cached
 def get_status_layer(text, color='translucent green', width=200, offset=20, x_shift=0):
     background = rp.uniform_byte_color_image(height=int(60*DPI),width=int(width*DPI),color=color)
     background = rp.with_corner_radius(background, int(40*DPI), antialias=False)
@@ -242,9 +276,9 @@ def get_status_layer(text, color='translucent green', width=200, offset=20, x_sh
     label_image = rp.cv_resize_image(label_image,.5,alpha_weighted=True)
     label_image = rp.bordered_image_solid_color(label_image, thickness=round(offset*DPI), color='transparent')
     label_image = rp.shift_image(label_image, x=int(x_shift*DPI))
-    return contig(label_image)
+    return SparseLayer(label_image, 0, 0, H_SCALED, W_SCALED)
 
-@rp.memoized_lru(2048)
+@layer_cache.cached
 def get_chat_layer(text='Hello World', background_color='black', rim_color='gray', text_color='white', width=400, height=60, font_size=24, y_offset=-20):
     background = rp.uniform_byte_color_image(height=int(height*DPI), width=int(width*DPI), color=background_color)
     background = rp.with_corner_radius(background, int(20*DPI), antialias=False)
@@ -254,10 +288,15 @@ def get_chat_layer(text='Hello World', background_color='black', rim_color='gray
     chat_image = rp.cv_resize_image(chat_image,.5,alpha_weighted=True)
     
     # Position at bottom-center with y_offset
-    layer = rp.uniform_byte_color_image(H_SCALED, W_SCALED)
-    layer = rp.skia_stamp_image(layer, chat_image, offset=[0, int(y_offset*DPI)], sprite_origin=(.5, 1), canvas_origin=(.5, 1), copy=False)
+    chat_height, chat_width = chat_image.shape[:2]
+    position = [W_SCALED * .5 - chat_width * .5, H_SCALED + int(y_offset*DPI) - chat_height]
     
-    return contig(layer)
+    return sprites_layer([chat_image], [position], H_SCALED, W_SCALED)
+
+@functools.lru_cache(8)
+def get_blended_tracks(track_alpha):
+    """Tracks blended from counter_tracks to target_tracks, built once per alpha."""
+    return rp.blend(counter_tracks, target_tracks, track_alpha)
 
 def srgb_blend(x,y,a):
     x = rp.srgb_to_linear(x)
@@ -269,7 +308,7 @@ def srgb_blend(x,y,a):
 def imblend(x,y,a):return srgb_blend(x,y,a)
 def imblend(x,y,a):return rp.skia_stamp_image(x,y,alpha=a)
 
-@rp.memoized_lru(2048)
+@layer_cache.cached
 def blended_video_layer(frame_number, alpha):
     counter_frame = rp.cv_resize_image(counter_video[frame_number], (H_SCALED, W_SCALED))
     target_frame = rp.cv_resize_image(target_video[frame_number], (H_SCALED, W_SCALED))
@@ -278,7 +317,7 @@ def blended_video_layer(frame_number, alpha):
     else:
         return srgb_blend(counter_frame, target_frame, alpha)
 
-@rp.memoized_lru(2048)
+@layer_cache.cached
 def final_frame(
     frame_number=25,
     video_alpha=.5,
@@ -309,34 +348,71 @@ def final_frame(
     chat_height = 60,
     chat_font_size = 24,
     chat_y_offset = -20,
+    out = None,
 ):
+    """
+    Composite one frame of the figure.
+
+    Args:
+        out: Optional (H_SCALED, W_SCALED, 4) contiguous uint8 buffer to
+            composite into and return, e.g. one reused for every frame of a
+            render, so no frame is allocated. Being an array, it also keeps
+            the frame out of the layer cache, whose frames must not share a
+            buffer.
+    """
 
-    blended_tracks = rp.blend(counter_tracks, target_tracks, track_alpha)
+    blended_tracks = get_blended_tracks(track_alpha)
     visibles = counter_visibles & target_visibles
+    blended = ('blended', track_alpha)
 
-    blended_frame = blended_video_layer(frame_number, video_alpha)
+    with stage('final_frame.video'):
+        blended_frame = blended_video_layer(frame_number, video_alpha)
 
     visible_hand_numbers = sorted(set(track_numbers) & set(hand_numbers))
 
-    circles_layer = get_circles_layer(blended_tracks, visibles, frame_number, track_numbers)
-    arrows_layer = get_arrows_layer(counter_tracks, counter_visibles, blended_tracks, target_visibles, frame_number, track_numbers)
-    target_trails_layer  = get_trails_layer(target_tracks , target_visibles , frame_number, track_numbers)
-    counter_trails_layer = get_trails_layer(counter_tracks, counter_visibles, frame_number, track_numbers)
-    blended_trails_layer = get_trails_layer(blended_tracks, counter_visibles, frame_number, track_numbers)
-    hand_layer = get_hand_layer(blended_tracks, visibles, frame_number, hand_grabbing, hand_dx, hand_dy, hand_size, visible_hand_numbers)
-    status_layer = get_status_layer(status_text, status_color, status_width, status_offset, status_x_shift)
-    chat_layer = get_chat_layer(chat_text, chat_background_color, chat_rim_color, chat_text_color, chat_width, chat_height, chat_font_size, chat_y_offset)
-
-    output = blended_frame
-    
-    output = imblend(output, target_trails_layer , target_trails_alpha )
-    output = imblend(output, blended_trails_layer, blended_trails_alpha)
-    output = imblend(output, counter_trails_layer, counter_trails_alpha)
-    output = imblend(output, circles_layer,circles_alpha)
-    output = imblend(output, arrows_layer, arrows_alpha)
-    output = imblend(output, hand_layer, hand_alpha)
-    output = imblend(output, chat_layer, chat_alpha)
-    output = imblend(output, status_layer, status_alpha)
+    # Layers with alpha 0 would not change the frame, so they are not rendered at all
+    layers = {}
+    with stage('final_frame.circles'):
+        if circles_alpha:
+            layers['circles'] = get_circles_layer(blended_tracks, visibles, frame_number, track_numbers, key=blended)
+    with stage('final_frame.arrows'):
+        if arrows_alpha:
+            layers['arrows'] = get_arrows_layer(counter_tracks, counter_visibles, blended_tracks, target_visibles, frame_number, track_numbers, key=('counter', blended))
+    with stage('final_frame.trails'):
+        if target_trails_alpha:
+            layers['target_trails']  = get_trails_layer(target_tracks , target_visibles , frame_number, track_numbers, key='target')
+        if counter_trails_alpha:
+            layers['counter_trails'] = get_trails_layer(counter_tracks, counter_visibles, frame_number, track_numbers, key='counter')
+        if blended_trails_alpha:
+            layers['blended_trails'] = get_trails_layer(blended_tracks, counter_visibles, frame_number, track_numbers, key=blended)
+    with stage('final_frame.hands'):
+        if hand_alpha:
+            layers['hand'] = get_hand_layer(blended_tracks, visibles, frame_number, hand_grabbing, hand_dx, hand_dy, hand_size, visible_hand_numbers, key=blended)
+    with stage('final_frame.labels'):
+        if status_alpha:
+            layers['status'] = get_status_layer(status_text, status_color, status_width, status_offset, status_x_shift)
+        if chat_alpha:
+            layers['chat'] = get_chat_layer(chat_text, chat_background_color, chat_rim_color, chat_text_color, chat_width, chat_height, chat_font_size, chat_y_offset)
+
+    with stage('final_frame.composite'):
+        output = composite_layers(
+            blended_frame,
+            [
+                (layers.get(name), alpha)
+                for name, alpha in [
+                    ('target_trails' , target_trails_alpha ),
+                    ('blended_trails', blended_trails_alpha),
+                    ('counter_trails', counter_trails_alpha),
+                    ('circles', circles_alpha),
+                    ('arrows', arrows_alpha),
+                    ('hand', hand_alpha),
+                    ('chat', chat_alpha),
+                    ('status', status_alpha),
+                ]
+                if alpha
+            ],
+            out=out,
+        )
 
     return output
 
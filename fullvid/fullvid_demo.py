@@ -13,8 +13,8 @@ def _():
     from rp.libs.tweenline import tween
     from functools import partial
 
-    from fullvid import final_frame, N, T, H, W
-    return N, T, final_frame, mo, partial, rp, tween
+    from fullvid import final_frame, N, T, H, W, H_SCALED, W_SCALED
+    return H_SCALED, N, T, W_SCALED, final_frame, mo, np, partial, rp, tween
 
 
 @app.cell
@@ -327,16 +327,18 @@ def _(
 
 
 @app.cell
-def _(final_frame, rp, timeline):
-    def get_frame(frame_number):
+def _(H_SCALED, W_SCALED, final_frame, np, rp, timeline):
+    def get_frame(frame_number, out=None):
         state = timeline[frame_number]
-        frame = final_frame(**state)
+        frame = final_frame(**state, out=out)
         return frame
 
 
     def get_video(render_start=None, render_end=None):
+        # Every frame is composited into one buffer; save_video_mp4 encodes each frame before asking for the next
+        out = np.empty((H_SCALED, W_SCALED, 4), np.uint8)
         for frame_number in rp.eta(range(render_start, render_end), "Rendering"):
-            yield get_frame(frame_number)
+            yield get_frame(frame_number, out=out)
         # for state in rp.eta(timeline, "Rendering"):
         #     frame = final_frame(**state)
         #     yield frame
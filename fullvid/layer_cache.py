@@ -0,0 +1,243 @@
+"""
+Byte-bounded cache of rendered fullvid layers.
+
+rp.memoized_lru keys on every argument, so layers drawn from (T, N, 2) track
+arrays had to hash or compare whole arrays on every lookup, and missed
+whenever the arrays were rebuilt (as the blended tracks are on every
+frame). Here array arguments are left out of the key: the caller names
+them with a small key instead, such as ('blended', track_alpha), and the
+cache adds the dataset version, so a lookup hashes a few numbers.
+
+Eviction is least-recently-used by total bytes rather than by entry count,
+since one full-resolution RGBA layer at DPI=2 is about 5.5 MB.
+
+Given a directory, layers of functions decorated with cached(persist=True)
+are also stored on disk, compressed into .npz files named by a digest of
+their key, so they outlive the process: a second render only redraws
+layers whose key changed, and render processes sharing a directory share
+their layers. Only layers that are slow to draw and small to store (the
+track layers) are worth persisting; video frames and final frames are
+cheaper to rebuild than to keep. Files are written to a temporary name and
+renamed into place, so readers never see a partial layer, and the least
+recently used files are deleted once the directory outgrows max_disk_bytes.
+"""
+
+import functools
+import hashlib
+import os
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from rp.git.Figures.fullvid.sparse_layer import SparseLayer
+
+
+def _freeze(value):
+    """A hashable stand-in for a layer argument: lists, ranges and sets become tuples."""
+    if isinstance(value, (list, tuple, range)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class LayerCache:
+    """
+    Least-recently-used cache of layers, bounded by the bytes they hold.
+
+    Layers may be arrays or any object with an nbytes attribute. Only
+    arrays and SparseLayers can be persisted on disk.
+
+    Cached layers are shared between callers and must not be modified.
+
+    Attributes:
+        max_bytes: Most bytes held in memory at once; older layers are
+            evicted past it.
+        version: Part of every key. Change it (e.g. when the tracks or
+            videos are reloaded) so no layer of the old data is reused.
+            With a directory it must also identify the data across
+            processes, like a digest of the input files.
+        directory: Where layers of persisted functions are stored on
+            disk, or None to keep every layer in memory only.
+        max_disk_bytes: Most bytes of files kept in directory; the least
+            recently used files are deleted past it.
+        hits, misses, evictions: In-memory counters since the last clear().
+        disk_hits, disk_writes, disk_evictions: Files loaded from, saved to
+            and deleted from directory.
+
+    Example:
+        >>> cache = LayerCache(2 * 2**30, version=edit_path)
+        >>> @cache.cached(persist=True)
+        ... def get_circles_layer(tracks, visibles, frame_number, track_numbers=None): ...
+        >>> get_circles_layer(tracks, visibles, 10, [0, 2], key=('blended', 0.5))
+    """
+
+    def __init__(self, max_bytes, version=None, directory=None, max_disk_bytes=2 * 2**30):
+        self.max_bytes = max_bytes
+        self.version = version
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_bytes = None  # Measured on the first save
+        self.clear()
+
+    def clear(self):
+        """Drop every layer held in memory and zero the counters. Layers on disk are kept."""
+        self._layers = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.disk_evictions = 0
+
+    def get(self, key, default=None):
+        """The layer stored under key, marked as most recently used, or default."""
+        if key not in self._layers:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._layers.move_to_end(key)
+        return self._layers[key]
+
+    def put(self, key, layer):
+        """Store a layer, evicting the least recently used ones past max_bytes."""
+        if key in self._layers:
+            self.nbytes -= self._layers.pop(key).nbytes
+        if layer.nbytes > self.max_bytes:
+            return
+        self._layers[key] = layer
+        self.nbytes += layer.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._layers.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def path(self, key):
+        """The file a key's layer is stored in, under a folder per layer function."""
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, str(key[0]), digest + '.npz')
+
+    def load(self, key):
+        """The layer stored on disk under key, or None if there is none (or no directory)."""
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with np.load(path) as arrays:
+                if 'array' in arrays:
+                    layer = arrays['array']
+                else:
+                    layer = SparseLayer(arrays['image'], *map(int, arrays['bounds']))
+            os.utime(path)  # Mark as recently used for prune()
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+        self.disk_hits += 1
+        return layer
+
+    def save(self, key, layer):
+        """Store an array or SparseLayer on disk under key, if there is a directory."""
+        if self.directory is None:
+            return
+        if isinstance(layer, SparseLayer):
+            arrays = dict(image=layer.image, bounds=np.array([layer.x, layer.y, layer.height, layer.width]))
+        elif isinstance(layer, np.ndarray):
+            arrays = dict(array=layer)
+        else:
+            raise TypeError(f"Only arrays and SparseLayers can be stored on disk, but got {type(layer).__name__}")
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temp_path, path)
+        self.disk_writes += 1
+
+        if self.disk_bytes is None:
+            self.prune()
+        else:
+            self.disk_bytes += os.path.getsize(path)
+            if self.disk_bytes > self.max_disk_bytes:
+                self.prune()
+
+    def prune(self):
+        """Delete the least recently used files in directory until it holds at most max_disk_bytes."""
+        files = []
+        for folder, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue  # Being written by another process
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Deleted by another process
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        self.disk_bytes = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+            self.disk_evictions += 1
+
+    def cached(self, function=None, *, persist=False):
+        """
+        Decorate a layer function so its layers are cached.
+
+        The decorated function takes an extra key= argument naming its array
+        arguments, which are then left out of the cache key. Calls with
+        array arguments and no key are rendered without caching. Other
+        arguments are part of the key, with lists (like track_numbers)
+        frozen into tuples.
+
+        With persist=True (as @cache.cached(persist=True)), layers are also
+        stored in and loaded from directory.
+        """
+        if function is None:
+            return functools.partial(self.cached, persist=persist)
+
+        @functools.wraps(function)
+        def wrapper(*args, key=None, **kwargs):
+            values = list(args) + list(kwargs.values())
+            has_arrays = any(isinstance(value, np.ndarray) for value in values)
+            if has_arrays and key is None:
+                return function(*args, **kwargs)
+
+            full_key = (
+                function.__qualname__,
+                self.version,
+                _freeze(key),
+                tuple(_freeze(value) for value in args if not isinstance(value, np.ndarray)),
+                tuple(sorted((name, _freeze(value)) for name, value in kwargs.items() if not isinstance(value, np.ndarray))),
+            )
+            layer = self.get(full_key)
+            if layer is None:
+                layer = self.load(full_key) if persist else None
+                if layer is None:
+                    layer = function(*args, **kwargs)
+                    if persist:
+                        self.save(full_key, layer)
+                self.put(full_key, layer)
+            return layer
+
+        return wrapper
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __repr__(self):
+        return (
+            f"LayerCache({len(self)} layers, {self.nbytes / 2**20:.0f}/{self.max_bytes / 2**20:.0f} MB, "
+            f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+            f"disk_hits={self.disk_hits}, disk_writes={self.disk_writes}, disk_evictions={self.disk_evictions})"
+        )
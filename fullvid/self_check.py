@@ -0,0 +1,112 @@
+"""
+Self-checks for the fullvid layer machinery, on small synthetic tracks.
+
+fullvid.py loads its dataset on import, so these checks only use the
+modules it builds on: a trails layer cached as a SparseLayer must keep its
+pixels while the TrailAccumulator it came from is stepped further, since
+the accumulator draws into the same buffer every frame.
+
+Run as a module of the installed package:
+    python -m rp.git.Figures.fullvid.self_check
+"""
+
+import sys
+
+import numpy as np
+
+from rp.git.Figures.fullvid.layer_cache import LayerCache
+from rp.git.Figures.fullvid.sparse_layer import SparseLayer
+from rp.git.Figures.fullvid.trail_accumulator import TrailAccumulator
+
+HEIGHT, WIDTH = 48, 64
+TRAIL_STYLE = dict(stroke_width=4, stroke_join='round', fill=None, close=False)
+TRAIL_COLORS = [(1, 0, 0, 1), (0, 0, 1, 1)]
+
+
+def crossing_tracks():
+    """
+    Two tracks, the first of which crosses the whole width by frame 2.
+
+    A layer of frame 2 then covers rows that span the full width, where
+    cropping it would give a view of the accumulator's buffer rather than
+    a copy. The second track keeps drawing in those rows on frames 3 and 4.
+
+    Returns:
+        (tracks, visibles) with shapes (5, 2, 2) and (5, 2).
+    """
+    tracks = np.array([
+        [[-10, 20], [10, 22]],
+        [[30, 20], [10, 22]],
+        [[80, 20], [10, 22]],
+        [[80, 20], [30, 22]],
+        [[80, 20], [50, 22]],
+    ], dtype=float)
+    visibles = np.ones(tracks.shape[:2], bool)
+    return tracks, visibles
+
+
+def check_sparse_layer_copies():
+    """
+    Check that a SparseLayer owns its pixels rather than viewing its image.
+
+    Returns:
+        dict with shares_memory and changed, both False when the check passes.
+    """
+    image = np.zeros((HEIGHT, WIDTH, 4), np.uint8)
+    image[10:20] = 255
+    layer = SparseLayer.from_image(image)
+    shares_memory = bool(np.shares_memory(layer.image, image))
+
+    image[15] = 0
+    return dict(shares_memory=shares_memory, changed=not (layer.image == 255).all())
+
+
+def check_cached_trails_layer():
+    """
+    Cache a trails layer, step its accumulator past it, and compare the pixels.
+
+    Returns:
+        dict with full_width (whether the layer spans the canvas, which the
+        check needs), cache_hit, changed (whether the cached pixels changed
+        when the accumulator stepped) and replay_diff (the largest
+        difference after seeking back to the cached frame).
+    """
+    tracks, visibles = crossing_tracks()
+    accumulator = TrailAccumulator(tracks, visibles, [0, 1], HEIGHT, WIDTH, TRAIL_COLORS, TRAIL_STYLE)
+    cache = LayerCache(2**20)
+
+    @cache.cached
+    def get_trails_layer(tracks, visibles, frame_number):
+        return SparseLayer.from_image(accumulator.seek(frame_number))
+
+    layer = get_trails_layer(tracks, visibles, 2, key='trails')
+    pixels = layer.image.copy()
+
+    accumulator.seek(4)
+    cache_hit = get_trails_layer(tracks, visibles, 2, key='trails') is layer
+    replayed = SparseLayer.from_image(accumulator.seek(2)).image
+
+    return dict(
+        full_width=layer.image.shape[1] == WIDTH,
+        cache_hit=cache_hit,
+        changed=not np.array_equal(layer.image, pixels),
+        replay_diff=int(np.abs(replayed.astype(int) - pixels).max()) if replayed.shape == pixels.shape else None,
+    )
+
+
+def main():
+    """Run every check, print the results, and return 1 if any failed."""
+    copies = check_sparse_layer_copies()
+    cached = check_cached_trails_layer()
+    checks = [
+        ("SparseLayer owns its pixels", not copies['shares_memory'] and not copies['changed']),
+        ("cached trails layer survives accumulator steps", cached['full_width'] and cached['cache_hit'] and not cached['changed']),
+        ("replaying the accumulator redraws the same frame", cached['replay_diff'] == 0),
+    ]
+    for name, passed in checks:
+        print(f"    {'ok  ' if passed else 'FAIL'} {name}")
+    return 0 if all(passed for _, passed in checks) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
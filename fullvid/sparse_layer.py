@@ -0,0 +1,142 @@
+"""
+Sparse layers for fullvid: a tight crop of a layer's pixels plus where it goes.
+
+Most fullvid layers cover a small part of the frame (a few circles, a status
+pill, a chat bubble), but full-frame RGBA layers cost H×W×4 bytes each to
+keep, cache and blend. A SparseLayer keeps only the covered rectangle, and
+compositing it touches only that rectangle of the frame. Pixels outside it
+are transparent, which blending leaves unchanged, so the composite matches
+blending the full-frame layer.
+"""
+
+import numpy as np
+
+import rp
+
+
+class SparseLayer:
+    """
+    An RGBA layer on a height×width canvas, stored as the crop of it that has any coverage.
+
+    Attributes:
+        image: (h, w, 4) contiguous uint8 RGBA crop, inside the canvas. The
+            layer owns it: it is always a copy, never a view of the image
+            the layer was made from, so that image can be drawn on again.
+        x, y: Canvas position of the crop's top-left pixel.
+        height, width: Size of the canvas.
+    """
+
+    def __init__(self, image, x, y, height, width):
+        image = rp.as_rgba_image(rp.as_byte_image(image, copy=False), copy=False)
+        x, y = int(x), int(y)
+
+        # Clip the crop to the canvas
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + image.shape[1], width), min(y + image.shape[0], height)
+        image = image[y0 - y:max(y1, y0) - y, x0 - x:max(x1, x0) - x]
+
+        self.image = np.array(image, order='C', copy=True)
+        self.x, self.y = x0, y0
+        self.height, self.width = height, width
+
+    @classmethod
+    def from_image(cls, image):
+        """The SparseLayer of a full-canvas image, cropped to its pixels with nonzero alpha."""
+        image = rp.as_rgba_image(rp.as_byte_image(image, copy=False), copy=False)
+        height, width = image.shape[:2]
+        covered = image[..., 3] > 0
+        rows, cols = np.flatnonzero(covered.any(axis=1)), np.flatnonzero(covered.any(axis=0))
+        if not len(rows):
+            return cls(image[:0, :0], 0, 0, height, width)
+        return cls(image[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], cols[0], rows[0], height, width)
+
+    @property
+    def nbytes(self):
+        return self.image.nbytes
+
+    def to_image(self):
+        """The layer as a full (height, width, 4) canvas."""
+        canvas = np.zeros((self.height, self.width, 4), np.uint8)
+        canvas[self.y:self.y + self.image.shape[0], self.x:self.x + self.image.shape[1]] = self.image
+        return canvas
+
+    def stamp_onto(self, canvas, alpha=1):
+        """Blend the layer onto an RGBA uint8 canvas of the same size in place, like rp.skia_stamp_image."""
+        h, w = self.image.shape[:2]
+        if not h or not w or not alpha:
+            return canvas
+        region = canvas[self.y:self.y + h, self.x:self.x + w]
+        region[:] = rp.skia_stamp_image(region, self.image, alpha=alpha, copy=True)
+        return canvas
+
+    def __repr__(self):
+        h, w = self.image.shape[:2]
+        return f"SparseLayer({w}x{h} at ({self.x}, {self.y}) on {self.width}x{self.height})"
+
+
+def sprites_layer(sprites, positions, height, width):
+    """
+    Stamp sprites onto a transparent canvas, allocating only the rectangle they cover.
+
+    Matches rp.skia_stamp_image onto a full transparent canvas: the
+    rectangle is aligned to whole pixels and every sprite keeps the
+    fractional part of its position.
+
+    Args:
+        sprites: RGBA sprites (contiguous uint8 is fastest).
+        positions: Float (x, y) canvas position of every sprite's top-left corner.
+        height, width: Size of the canvas.
+
+    Returns:
+        SparseLayer
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    if not len(positions):
+        return SparseLayer(np.zeros((0, 0, 4), np.uint8), 0, 0, height, width)
+
+    sizes = np.array([np.shape(sprite)[1::-1] for sprite in sprites], dtype=float)
+    x0, y0 = np.maximum(np.floor(positions.min(axis=0)).astype(int), 0)
+    x1, y1 = np.minimum(np.ceil((positions + sizes).max(axis=0)).astype(int), [width, height])
+    canvas = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0), 4), np.uint8)
+    for sprite, (x, y) in zip(sprites, positions):
+        canvas = rp.skia_stamp_image(canvas, sprite, offset=[float(x - x0), float(y - y0)], copy=False)
+    return SparseLayer(canvas, x0, y0, height, width)
+
+
+def composite_layers(background, layers, out=None):
+    """
+    Blend (SparseLayer, alpha) pairs over a background in order, in one pass through one Skia canvas.
+
+    The background is written into the output once, and every layer is then
+    drawn over only the rectangle it covers. Layers with alpha 0 or no
+    pixels are skipped. The result matches stamping the layers one by one
+    with rp.skia_stamp_image.
+
+    Args:
+        background: Image the size of the layers' canvas.
+        layers: Sequence of (SparseLayer, alpha) pairs, bottom first.
+        out: Optional (height, width, 4) contiguous uint8 buffer to composite
+            into and return, e.g. one reused for every frame of a render.
+
+    Returns:
+        The (height, width, 4) uint8 RGBA composite.
+    """
+    skia = rp.pip_import('skia')
+
+    background = rp.as_rgba_image(rp.as_byte_image(background, copy=False), copy=False)
+    if out is None:
+        out = np.empty(background.shape, np.uint8)
+    elif out.shape != background.shape or out.dtype != np.uint8 or not out.flags.c_contiguous:
+        raise ValueError(f"out must be a contiguous {background.shape} uint8 array, but got shape={out.shape} dtype={out.dtype}")
+    out[:] = background
+
+    layers = [(layer, alpha) for layer, alpha in layers if alpha and layer.image.size]
+    if layers:
+        with skia.Surface(out) as canvas:
+            for layer, alpha in layers:
+                paint = skia.Paint()
+                if alpha != 1:
+                    paint.setAlphaf(alpha)
+                image = skia.Image.fromarray(layer.image, copy=False)
+                canvas.drawImage(image, float(layer.x), float(layer.y), skia.SamplingOptions(), paint)
+    return out
@@ -0,0 +1,104 @@
+"""
+Trails layers that are extended frame by frame instead of redrawn from frame 0.
+
+Kept apart from fullvid.py, which loads its dataset on import, so the
+accumulator can be used (and checked, see self_check.py) on any tracks.
+"""
+
+import numpy as np
+
+import rp
+from rp.git.Figures.arrow.arrow import ContourStyle, skia_draw_contours
+
+
+class TrailAccumulator:
+    """
+    A trails layer that is extended frame by frame instead of redrawn from frame 0.
+
+    Each step draws only the segments from frame t-1 to frame t, with the
+    dotted pattern's phase continued from the arc length drawn so far, and
+    recomputes the drop shadow only around those segments (the blur has a
+    finite kernel, so the shadow elsewhere is unchanged). Seeking backwards
+    replays the steps from frame 0, so a frame always looks the same however
+    it was reached.
+
+    The layer is updated in place: copy it (e.g. into a SparseLayer) before
+    stepping again if it must be kept.
+
+    Args:
+        tracks: (T, N, 2) track positions, before scaling.
+        visibles: (T, N) bool visibility of every track.
+        track_numbers: The tracks to draw.
+        height, width: Size of the layer.
+        colors: Stroke color of every track, indexed by track number.
+        style: ContourStyle arguments shared by every trail, without
+            stroke_color or stroke_phase. Must include stroke_width.
+        shadow_blur: Blur of the black drop shadow, or None for no shadow.
+        scale: Factor the track positions are multiplied by (e.g. DPI).
+    """
+
+    def __init__(self, tracks, visibles, track_numbers, height, width, colors, style, shadow_blur=None, scale=1.0):
+        self.tracks = tracks
+        self.visibles = visibles
+        self.track_numbers = list(track_numbers)
+        self.height, self.width = height, width
+        self.colors = colors
+        self.style = style
+        self.shadow_blur = shadow_blur
+        self.scale = scale
+        self.reset()
+
+    def reset(self):
+        self.frame_number = 0
+        self.raw = rp.uniform_byte_color_image(self.height, self.width)
+        self.raw = np.ascontiguousarray(rp.as_rgba_image(self.raw, copy=False))
+        self.layer = self.shadowed(self.raw)
+        self.lengths = np.zeros(len(self.track_numbers))  # Arc length of each track's current subtrail
+
+    def shadowed(self, raw):
+        if self.shadow_blur is None:
+            return raw.copy()
+        shadowed = rp.with_drop_shadow(raw, color='black', blur=self.shadow_blur)
+        return rp.as_rgba_image(rp.as_byte_image(shadowed, copy=False), copy=False)
+
+    def step(self):
+        """Draw the segments from frame_number to frame_number+1."""
+        t = self.frame_number + 1
+        numbers = self.track_numbers
+        # Points are truncated to integers when drawn, so arc lengths are measured on them too
+        xy0 = np.trunc(self.tracks[t - 1, numbers].astype(float) * self.scale)
+        xy1 = np.trunc(self.tracks[t, numbers].astype(float) * self.scale)
+        drawn = self.visibles[t - 1, numbers] & self.visibles[t, numbers]
+        phases = np.where(drawn, self.lengths, 0)
+        self.lengths = np.where(drawn, phases + np.hypot(*(xy1 - xy0).T), 0)
+        self.frame_number = t
+        if not drawn.any():
+            return
+
+        segments = [
+            ([xy0[i], xy1[i]], ContourStyle(stroke_color=self.colors[n], stroke_phase=float(phases[i]), **self.style))
+            for i, n in enumerate(numbers) if drawn[i]
+        ]
+        self.raw = skia_draw_contours(self.raw, segments, copy=False)
+
+        # The new pixels change the shadow up to one blur radius around them, and
+        # those shadow pixels depend on raw pixels up to one more radius away
+        points = np.concatenate([xy0[drawn], xy1[drawn]])
+        radius = 0 if self.shadow_blur is None else self.shadow_blur // 2 + 1
+        pad = self.style['stroke_width'] / 2 + 2 + radius
+        x0, y0 = np.floor(points.min(axis=0) - pad).astype(int)
+        x1, y1 = np.ceil(points.max(axis=0) + pad).astype(int)
+        X0, Y0 = max(x0 - radius, 0), max(y0 - radius, 0)
+        X1, Y1 = min(x1 + radius, self.width), min(y1 + radius, self.height)
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, self.width), min(y1, self.height)
+        if x0 < x1 and y0 < y1:
+            region = self.shadowed(self.raw[Y0:Y1, X0:X1])
+            self.layer[y0:y1, x0:x1] = region[y0 - Y0:y1 - Y0, x0 - X0:x1 - X0]
+
+    def seek(self, frame_number):
+        """Advance to frame_number, starting over from frame 0 when it is behind the current frame."""
+        if frame_number < self.frame_number:
+            self.reset()
+        while self.frame_number < frame_number:
+            self.step()
+        return self.layer
@@ -0,0 +1,142 @@
+"""
+Opt-in per-stage profiling for the Figures renderers.
+
+Renderers wrap their expensive steps in stage(name) blocks, named
+'<function>.<stage>'. Outside of a profile() block, stage returns one shared
+no-op context manager, so the hooks cost a function call when profiling is
+off. Inside one, every stage records its wall time, call count and where it
+ran, and the recording can be saved as a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev) or as collapsed stacks for flamegraph.pl and
+speedscope.
+
+Example:
+    >>> with profile() as p:
+    ...     video = draw_tracks(tracks, video, visible, trail_length=10)
+    >>> p.seconds
+    {'draw_tracks.background': 0.012, 'draw_tracks.cull': 0.004, ...}
+    >>> p.save_chrome_trace('draw_tracks_trace.json')
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# The Profiler of the innermost active profile() block, or None
+_active_profiler = None
+
+_NO_STAGE = nullcontext()
+
+
+class Profiler:
+    """
+    Wall time, call counts and a timeline of named stages.
+
+    Stages may nest; a stage's time includes the stages inside it.
+
+    Attributes:
+        seconds: Dict of total seconds spent in each stage.
+        calls: Dict of how many times each stage ran.
+        events: List of (stack, start, seconds, thread_id) for every stage
+            call in the order they finished, where stack is the tuple of
+            stage names from the outermost down to this one and start is in
+            seconds since the profiler was created.
+    """
+
+    def __init__(self):
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Forget every recorded stage."""
+        self.seconds = {}
+        self.calls = {}
+        self.events = []
+        self._origin = time.perf_counter()
+        self._stacks = threading.local()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of a with block as one call of the named stage."""
+        stack = getattr(self._stacks, 'names', ())
+        self._stacks.names = stack + (name,)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stacks.names = stack
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.events.append((stack + (name,), start - self._origin, seconds, threading.get_ident()))
+
+    def chrome_trace(self):
+        """The recorded stages in Chrome's Trace Event Format, as a dict ready for json.dump."""
+        pid = os.getpid()
+        return dict(
+            traceEvents=[
+                dict(name=stack[-1], cat=stack[-1].split('.')[0], ph='X', ts=1e6 * start, dur=1e6 * seconds, pid=pid, tid=thread)
+                for stack, start, seconds, thread in self.events
+            ],
+            displayTimeUnit='ms',
+        )
+
+    def save_chrome_trace(self, path):
+        """Write chrome_trace() to a JSON file, for chrome://tracing or Perfetto."""
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+    def collapsed_stacks(self):
+        """
+        The recorded stages as collapsed stacks, one 'outer;inner microseconds' line per stack.
+
+        Times are self times (excluding nested stages), as flamegraph.pl and
+        speedscope expect.
+        """
+        total = {}
+        nested = {}
+        for stack, _, seconds, _ in self.events:
+            total[stack] = total.get(stack, 0.0) + seconds
+            if len(stack) > 1:
+                nested[stack[:-1]] = nested.get(stack[:-1], 0.0) + seconds
+        lines = []
+        for stack, seconds in total.items():
+            self_seconds = max(0.0, seconds - nested.get(stack, 0.0))
+            lines.append(f"{';'.join(stack)} {round(1e6 * self_seconds)}")
+        return '\n'.join(lines) + '\n'
+
+    def save_collapsed_stacks(self, path):
+        """Write collapsed_stacks() to a text file, for flamegraph.pl or speedscope."""
+        with open(path, 'w') as file:
+            file.write(self.collapsed_stacks())
+
+    def __repr__(self):
+        stages = ', '.join(f"{name}={1000 * seconds:.1f}ms/{self.calls[name]}" for name, seconds in self.seconds.items())
+        return f"Profiler({stages})"
+
+
+@contextmanager
+def profile():
+    """
+    Record the stages of every render inside the with block.
+
+    Only stages run in this process are recorded; renders with workers=
+    time their frames in worker processes, which are not seen.
+
+    Yields:
+        The Profiler collecting the stages.
+    """
+    global _active_profiler
+    profiler = Profiler()
+    previous, _active_profiler = _active_profiler, profiler
+    try:
+        yield profiler
+    finally:
+        _active_profiler = previous
+
+
+def stage(name):
+    """Context manager timing a named stage while profiling, and doing nothing otherwise."""
+    if _active_profiler is None:
+        return _NO_STAGE
+    return _active_profiler.stage(name)
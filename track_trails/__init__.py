@@ -1,6 +1,6 @@
 """Track visualization for video sequences."""
 
 from .draw_tracks import draw_tracks, demo
-from .draw_tracks_skia import draw_tracks_skia, demo_skia
+from .draw_tracks_mesh import draw_tracks_skia, demo_skia
 
 __all__ = ['draw_tracks', 'demo', 'draw_tracks_skia', 'demo_skia']
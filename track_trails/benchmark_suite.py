@@ -0,0 +1,298 @@
+"""
+Offline benchmark suite for the track renderers.
+
+Renders synthetic CoTracker-like tracks (a grid of query points following a
+drifting camera, with runs of occlusion, from draw_tracks_benchmark's
+synthetic_tracks) over smooth panning backgrounds, across a grid of track counts, trail lengths, supersampling factors, resolutions and
+scalar or per-track sizes. Each case reports frames/sec, peak RSS, the paints
+allocated and the time spent in every render
+stage (see profiling.py), and the results can be written to JSON or CSV and
+compared against an earlier report to catch regressions. No network video
+or rp.run_cotracker is needed.
+
+Run as a module of the installed package:
+    python -m rp.git.Figures.track_trails.benchmark_suite --report track_benchmark.json
+    python -m rp.git.Figures.track_trails.benchmark_suite --baseline track_benchmark.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ..profiling import profile
+from .draw_tracks import draw_tracks
+from .draw_tracks_benchmark import synthetic_tracks
+from .draw_tracks_mesh import draw_tracks_skia
+from .paint_cache import PaintCache
+
+RENDERERS = {
+    'draw_tracks': draw_tracks,
+    'draw_tracks_skia': draw_tracks_skia,
+}
+
+# Default grid of cases; draw_tracks has no supersampling, so it runs at 1 only
+NUM_TRACKS = (256, 1024)
+TRAIL_LENGTHS = (0, 10)
+SUPERSAMPLES = (1, 2)
+RESOLUTIONS = ((480, 720), (720, 1280))
+NUM_FRAMES = 16
+
+# 'scalar' draws every track at one size; 'per_track' gives every track its own
+# size on every frame, a (T, N) array, which must not cost more than a scalar
+SIZES = ('scalar', 'per_track')
+
+# A case is a regression when its frames/sec drops by more than this fraction
+REGRESSION_TOLERANCE = 0.1
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def run_case(renderer, num_tracks, trail_length, supersample, resolution, sizes='scalar', num_frames=NUM_FRAMES, seed=0):
+    """
+    Time one render on synthetic data.
+
+    Args:
+        renderer: Name of the renderer, a key of RENDERERS.
+        num_tracks: Number of tracks.
+        trail_length: Trail length in frames.
+        supersample: Supersampling factor (draw_tracks_skia only).
+        resolution: (H, W) frame size.
+        sizes: 'scalar' for size 4 everywhere, or 'per_track' for a random
+            (T, N) size between 2 and 6.
+        num_frames: Number of frames rendered.
+        seed: Random seed for the tracks and background.
+
+    Returns:
+        dict describing the case, with fps, seconds, peak_rss_mb (of the
+        whole process), rss_before_mb (before rendering), paint_allocations
+        (by the render's own PaintCache) and stages, the total seconds spent
+        in every render stage.
+    """
+    H, W = resolution
+    tracks, visible, video = synthetic_tracks(num_frames, num_tracks, H, W, occlusion=0.15, seed=seed, cotracker=True)
+
+    paint_cache = PaintCache()
+    kwargs = dict(trail_length=trail_length, color='cyan', paint_cache=paint_cache)
+    if renderer == 'draw_tracks_skia':
+        kwargs['supersample'] = supersample
+    if sizes == 'per_track':
+        kwargs['size'] = np.random.default_rng(seed).uniform(2, 6, size=(num_frames, num_tracks))
+    elif sizes != 'scalar':
+        raise ValueError(f"sizes must be 'scalar' or 'per_track', but got {sizes!r}")
+
+    rss_before = peak_rss_mb()
+    with profile() as profiler:
+        start = time.perf_counter()
+        RENDERERS[renderer](tracks, video, visible, **kwargs)
+        seconds = time.perf_counter() - start
+
+    return dict(
+        renderer=renderer,
+        num_tracks=num_tracks,
+        trail_length=trail_length,
+        supersample=supersample,
+        height=H,
+        width=W,
+        sizes=sizes,
+        num_frames=num_frames,
+        seconds=seconds,
+        fps=num_frames / seconds,
+        peak_rss_mb=peak_rss_mb(),
+        rss_before_mb=rss_before,
+        paint_allocations=paint_cache.allocations,
+        stages=dict(profiler.seconds),
+    )
+
+
+def _run_case_isolated(case):
+    """Run a case in a fresh process, so its peak RSS is its own."""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_case, **case).result()
+
+
+def benchmark_cases(
+    renderers=tuple(RENDERERS),
+    num_tracks=NUM_TRACKS,
+    trail_lengths=TRAIL_LENGTHS,
+    supersamples=SUPERSAMPLES,
+    resolutions=RESOLUTIONS,
+    sizes=SIZES,
+    num_frames=NUM_FRAMES,
+    seed=0,
+):
+    """List the keyword arguments of run_case for every combination of the given settings."""
+    cases = []
+    for renderer, N, trail_length, ss, resolution, size_mode in itertools.product(
+        renderers, num_tracks, trail_lengths, supersamples, resolutions, sizes
+    ):
+        if renderer == 'draw_tracks' and ss != supersamples[0]:
+            continue
+        cases.append(dict(
+            renderer=renderer,
+            num_tracks=N,
+            trail_length=trail_length,
+            supersample=ss if renderer == 'draw_tracks_skia' else 1,
+            resolution=tuple(resolution),
+            sizes=size_mode,
+            num_frames=num_frames,
+            seed=seed,
+        ))
+    return cases
+
+
+def run_suite(cases=None, isolate=True, report=None):
+    """
+    Run benchmark cases and optionally write a report.
+
+    Args:
+        cases: List of run_case keyword arguments (default: benchmark_cases()).
+        isolate: Run each case in its own process, so peak_rss_mb is per case
+            instead of the peak of every case run so far.
+        report: Optional .json or .csv path to write the results to.
+
+    Returns:
+        List of run_case results.
+    """
+    if cases is None:
+        cases = benchmark_cases()
+
+    results = []
+    for index, case in enumerate(cases):
+        result = _run_case_isolated(case) if isolate else run_case(**case)
+        result['isolated'] = isolate
+        results.append(result)
+        print(
+            f"[{index + 1}/{len(cases)}] {result['renderer']} N={result['num_tracks']} "
+            f"trail_length={result['trail_length']} supersample={result['supersample']} "
+            f"{result['width']}x{result['height']} sizes={result['sizes']}: {result['fps']:.2f} frames/sec, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB, {result['paint_allocations']} paints"
+        )
+
+    if report is not None:
+        write_report(results, report)
+    return results
+
+
+def machine_info():
+    """Describe the machine and library versions a report was made with."""
+    import skia
+
+    return dict(
+        platform=platform.platform(),
+        processor=platform.processor(),
+        cpu_count=os.cpu_count(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+        skia=getattr(skia, '__version__', None),
+    )
+
+
+def write_report(results, path):
+    """
+    Write benchmark results to a .json or .csv file.
+
+    JSON reports hold the machine info and every result as is. CSV reports
+    have one row per case, with one stage.<name> column per render stage.
+    """
+    if str(path).endswith('.csv'):
+        stages = sorted({name for result in results for name in result['stages']})
+        fields = [key for key in results[0] if key != 'stages'] + ['stage.' + name for name in stages]
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fields)
+            writer.writeheader()
+            for result in results:
+                row = {key: value for key, value in result.items() if key != 'stages'}
+                row.update({'stage.' + name: seconds for name, seconds in result['stages'].items()})
+                writer.writerow(row)
+    else:
+        with open(path, 'w') as file:
+            json.dump(dict(machine=machine_info(), results=results), file, indent=2)
+
+
+def load_report(path):
+    """Read the results of a report written by write_report."""
+    if str(path).endswith('.csv'):
+        with open(path, newline='') as file:
+            rows = list(csv.DictReader(file))
+        for row in rows:
+            for key in ['num_tracks', 'trail_length', 'supersample', 'height', 'width', 'num_frames']:
+                row[key] = int(row[key])
+            row['fps'] = float(row['fps'])
+            row.setdefault('sizes', 'scalar')
+        return rows
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def find_regressions(baseline, results, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare results against a baseline report's results.
+
+    Returns:
+        List of (case, baseline_fps, fps) for cases present in both whose
+        frames/sec dropped by more than tolerance.
+    """
+    def key(result):
+        names = ['renderer', 'num_tracks', 'trail_length', 'supersample', 'height', 'width']
+        return (*(result[name] for name in names), result.get('sizes', 'scalar'))
+
+    baseline_fps = {key(result): result['fps'] for result in baseline}
+    return [
+        (key(result), baseline_fps[key(result)], result['fps'])
+        for result in results
+        if key(result) in baseline_fps and result['fps'] < baseline_fps[key(result)] * (1 - tolerance)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--renderers', nargs='+', default=list(RENDERERS), choices=list(RENDERERS))
+    parser.add_argument('--tracks', nargs='+', type=int, default=list(NUM_TRACKS))
+    parser.add_argument('--trail-lengths', nargs='+', type=int, default=list(TRAIL_LENGTHS))
+    parser.add_argument('--supersample', nargs='+', type=int, default=list(SUPERSAMPLES))
+    parser.add_argument('--resolutions', nargs='+', default=[f"{H}x{W}" for H, W in RESOLUTIONS], help="HxW, e.g. 480x720")
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES), choices=list(SIZES))
+    parser.add_argument('--frames', type=int, default=NUM_FRAMES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', help="Write results to this .json or .csv file")
+    parser.add_argument('--baseline', help="Report to compare against; exits with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--no-isolate', action='store_true', help="Run every case in this process")
+    args = parser.parse_args(argv)
+
+    cases = benchmark_cases(
+        renderers=args.renderers,
+        num_tracks=args.tracks,
+        trail_lengths=args.trail_lengths,
+        supersamples=args.supersample,
+        resolutions=[tuple(int(size) for size in resolution.split('x')) for resolution in args.resolutions],
+        sizes=args.sizes,
+        num_frames=args.frames,
+        seed=args.seed,
+    )
+    results = run_suite(cases, isolate=not args.no_isolate, report=args.report)
+
+    if args.baseline:
+        regressions = find_regressions(load_report(args.baseline), results, args.tolerance)
+        for case, baseline_fps, fps in regressions:
+            print(f"REGRESSION {case}: {baseline_fps:.2f} -> {fps:.2f} frames/sec")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Spatial culling for the track renderers.
+
+When a visualization is zoomed into a crop, most tracks sit outside the
+W×H frame. Their trails are rejected by bounding box in one vectorized pass
+over the TrailWindow samples, before any segment or path is built, and
+individual trail segments that fall outside the frame are dropped before
+they reach Skia. The margins cover stroke width and antialiasing, so culling
+never changes a pixel.
+"""
+
+import numpy as np
+
+# Extra pixels around every primitive for antialiasing coverage
+AA_MARGIN = 1
+
+
+class CullStats:
+    """
+    Counts of primitives culled and drawn by the track renderers.
+
+    A primitive is a whole trail (one track's polyline), a single trail
+    segment of a trail that survived culling, or a current-position dot.
+    Only visible dots and trails with at least two samples are counted.
+
+    When level-of-detail simplification is on (lod=), trails_dropped counts
+    in-frame trails too short to draw and segments_saved the trail segments
+    that simplification removed, before the faint-tail cutoff.
+
+    Example:
+        >>> stats = CullStats()
+        >>> video = draw_tracks(tracks, video, visible, trail_length=10, cull_stats=stats)
+        >>> print(stats)
+        CullStats(trails=636 drawn/3671 culled, segments=9850/2159, dots=516/3788, ...)
+    """
+
+    def __init__(self):
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Zero every counter."""
+        self.trails_culled = 0
+        self.trails_drawn = 0
+        self.segments_culled = 0
+        self.segments_drawn = 0
+        self.dots_culled = 0
+        self.dots_drawn = 0
+        self.trails_dropped = 0
+        self.segments_saved = 0
+
+    def count(self, kind, keep):
+        """Add a boolean keep mask of trails, segments or dots to the counters."""
+        drawn = int(np.count_nonzero(keep))
+        setattr(self, kind + '_drawn', getattr(self, kind + '_drawn') + drawn)
+        setattr(self, kind + '_culled', getattr(self, kind + '_culled') + len(keep) - drawn)
+
+    @property
+    def culled(self):
+        return self.trails_culled + self.segments_culled + self.dots_culled
+
+    @property
+    def drawn(self):
+        return self.trails_drawn + self.segments_drawn + self.dots_drawn
+
+    @property
+    def culled_fraction(self):
+        """Fraction of counted primitives that were culled (0 if nothing was counted)."""
+        total = self.culled + self.drawn
+        return self.culled / total if total else 0.0
+
+    def __repr__(self):
+        return (
+            f"CullStats(trails={self.trails_drawn} drawn/{self.trails_culled} culled, "
+            f"segments={self.segments_drawn}/{self.segments_culled}, "
+            f"dots={self.dots_drawn}/{self.dots_culled}, "
+            f"lod={self.trails_dropped} trails dropped/{self.segments_saved} segments saved)"
+        )
+
+
+def trails_in_frame(points, num_points, W, H, margin=0, scale=1):
+    """
+    Find the trails whose bounding box reaches into the frame.
+
+    Args:
+        points: (N, L, 2) trail samples (see TrailWindow.packed).
+        num_points: (N,) number of valid samples per track.
+        W, H: Frame size in pixels.
+        margin: How far the drawn trail may extend past its samples, in pixels.
+            A number, or one per track.
+        scale: Factor the samples are multiplied by before drawing (e.g. supersample).
+
+    Returns:
+        (N,) bool array, True for trails with at least two samples that may
+        touch the frame.
+    """
+    valid = (np.arange(points.shape[1]) < num_points[:, None])[..., None]
+    margin = np.asarray(margin)[..., None]
+    lo = np.where(valid, points, np.inf).min(axis=1) * scale - margin
+    hi = np.where(valid, points, -np.inf).max(axis=1) * scale + margin
+    return (num_points >= 2) & (hi[:, 0] > 0) & (hi[:, 1] > 0) & (lo[:, 0] < W) & (lo[:, 1] < H)
+
+
+def segments_in_frame(lines, widths, W, H):
+    """
+    Find the round-capped line segments that reach into the frame.
+
+    Args:
+        lines: (M, 4) segments as x1, y1, x2, y2.
+        widths: (M,) stroke widths.
+        W, H: Frame size in pixels.
+
+    Returns:
+        (M,) bool array.
+    """
+    margin = widths / 2 + AA_MARGIN
+    x1, y1, x2, y2 = lines.T
+    return (
+        (np.maximum(x1, x2) + margin > 0)
+        & (np.maximum(y1, y2) + margin > 0)
+        & (np.minimum(x1, x2) - margin < W)
+        & (np.minimum(y1, y2) - margin < H)
+    )
+
+
+# Default counters shared by draw_tracks and draw_tracks_skia
+CULL_STATS = CullStats()
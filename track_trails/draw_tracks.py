@@ -6,10 +6,18 @@ Provides simple, flexible track drawing with motion trails.
 
 import numpy as np
 import skia
-from tqdm import tqdm
 
 import rp
 
+from .culling import AA_MARGIN, CULL_STATS, segments_in_frame, trails_in_frame
+from .paint_cache import PAINT_CACHE
+from .lod import MIN_TRAIL_LENGTH, resolve_lod, simplify_trails
+from .frame_source import check_output_buffer, copy_background, is_frame_stream, iter_rendered_frames
+from .parallel import render_frames_parallel
+from ..profiling import stage
+from .styles import frame_sizes, resolve_colors, resolve_sizes
+from .trail_window import TrailWindow
+
 # Number of sub-segments to interpolate between consecutive track points
 # for smooth line rendering. Higher values = smoother trails but slower rendering.
 TRAIL_SUBSTEPS = 4
@@ -28,6 +36,12 @@ def draw_tracks(
     rim_opacity=0.5,
     rim_color='white',
     rim_thickness=1,
+    lod=False,
+    paint_cache=None,
+    cull_stats=None,
+    workers=None,
+    stream=False,
+    out=None,
 ):
     """
     Draw tracked points and motion trails on video frames.
@@ -36,28 +50,58 @@ def draw_tracks(
     Flexible color input via rp.as_rgba_float_color (supports strings like
     'green', hex codes, RGB tuples, etc.).
 
-    TODO: Future 3D version with parallax, occlusion, and per-track colors
+    color, dot_size and trail_size can also be given per track, or per track
+    per frame; every track is still drawn in the same single pass.
+
+    TODO: Future 3D version with parallax and occlusion
           (see scratch.py for initial implementation with Z-depth handling).
 
     Args:
         tracks: numpy array of shape (T, N, 2) containing (x, y) coordinates.
                T = frames, N = number of points.
-        video: numpy array of shape (T, H, W, C) as reference video (uint8, RGB).
+        video: numpy array of shape (T, H, W, C) as reference video (uint8, RGB), or a
+               lazy iterable of frames (e.g. a generator or video reader) that is read
+               one frame at a time.
         visible: numpy array of shape (T, N) with boolean/numeric visibility.
                 If None, all points are visible.
         color: Color specification (string, hex, tuple). Passed to rp.as_rgba_float_color.
                Examples: 'green', '#ff0000', (1.0, 0.5, 0.0), (0.5, 0.5, 0.5, 0.8).
+               For per-track colors, pass N specs, an (N, 3|4) array of float colors,
+               or a (T, N) / (T, N, 3|4) array to also vary them over time.
+               Alpha is ignored, as for a single color.
         trail_length: Number of historical frames to show in trail (0 = dots only).
         dot_size: Radius multiplier for current position dot. If None, uses size parameter.
+                  May be an (N,) or (T, N) array of per-track sizes.
         trail_size: Width multiplier for trail lines. If None, uses size parameter.
+                    May be an (N,) or (T, N) array of per-track sizes.
         size: Base size for both dot and trail (default 4). Overridden by dot_size/trail_size.
         background: Background frames to composite onto (default: original video).
+                    Like video, may be a lazy iterable of frames.
         rim_opacity: Opacity of dot border (0-1, default 0.5).
         rim_color: Color of dot border (default 'white').
         rim_thickness: Thickness of dot border in pixels (default 1).
+        lod: Level-of-detail simplification for dense grids (default False = off).
+             True collapses samples within LOD_TOLERANCE pixels of a straight line and
+             skips trails shorter than MIN_TRAIL_LENGTH pixels; a number sets the
+             tolerance in pixels. Segments saved are counted in cull_stats.
+        paint_cache: PaintCache to take paints from (default: the shared PAINT_CACHE).
+                     Its allocation counters show how many paints the call created.
+        cull_stats: CullStats that counts the trails, trail segments and dots that were
+                    culled for lying outside the frame versus drawn (default: the shared
+                    CULL_STATS). Workers count into their own process-local CULL_STATS.
+        workers: Number of processes to render frames with (default None = serial,
+                 -1 = every CPU). Each worker uses its own process-local PAINT_CACHE.
+                 Needs video and background as arrays.
+        stream: If True, return a generator that yields each (H, W, 4) frame as soon as
+                it is drawn instead of stacking the whole video. Combined with a lazy
+                video/background, memory stays bounded regardless of clip length.
+        out: Optional preallocated (T, H, W, 4) uint8 array, e.g. a np.memmap. Each
+             background frame is copied into out[t] and Skia draws straight into it,
+             with no snapshots or restacking.
 
     Returns:
-        numpy array of shape (T, H, W, 4) with BGRA frames ready for video output.
+        numpy array of shape (T, H, W, 4) with BGRA frames ready for video output
+        (out itself if given). If stream=True, an iterator over those frames instead.
 
     Examples:
         >>> video = rp.load_video('video.mp4')
@@ -77,14 +121,23 @@ def draw_tracks(
 
     # Convert torch tensors to numpy for speed
     tracks = rp.as_numpy_array(tracks)
-    video = rp.as_numpy_array(video)
 
-    T, N, H, W, C = rp.validate_tensor_shapes(
-        tracks="T N 2",
-        video="T H W C",
-        XY=2,
-        return_dims="T N H W C",
-    )
+    # Frame streams are consumed lazily, so only the tracks can be validated up front
+    lazy = is_frame_stream(video) or is_frame_stream(background)
+    if lazy:
+        T, N = rp.validate_tensor_shapes(
+            tracks="T N 2",
+            XY=2,
+            return_dims="T N",
+        )
+    else:
+        video = rp.as_numpy_array(video)
+        T, N, H, W, C = rp.validate_tensor_shapes(
+            tracks="T N 2",
+            video="T H W C",
+            XY=2,
+            return_dims="T N H W C",
+        )
 
     if visible is None:
         visible = np.ones((T, N), dtype=bool)
@@ -96,26 +149,107 @@ def draw_tracks(
     if background is None:
         background = video
 
-    # Convert color to byte RGB
-    rgba_float = rp.as_rgba_float_color(color)
-    rgb_byte = rp.float_color_to_byte_color(rgba_float[:3])
-    r, g, b = rgb_byte
+    with stage('draw_tracks.setup'):
+        # Convert colors to a byte RGB palette and each track's entry in it
+        palette, color_index = resolve_colors(color, T, N)
+        palette = [rp.float_color_to_byte_color(rgba_float[:3]) for rgba_float in palette]
+
+        # Convert rim color to byte RGB
+        rim_rgba_float = rp.as_rgba_float_color(rim_color)
+        rim_rgb_byte = rp.float_color_to_byte_color(rim_rgba_float[:3])
+        rim_r, rim_g, rim_b = rim_rgb_byte
+
+        # Resolve dot and trail sizes
+        actual_dot_size = resolve_sizes(dot_size if dot_size is not None else size, T, N, 'dot_size')
+        actual_trail_size = resolve_sizes(trail_size if trail_size is not None else size, T, N, 'trail_size')
+
+    settings = dict(
+        trail_length=trail_length,
+        dot_size=actual_dot_size,
+        trail_size=actual_trail_size,
+        palette=palette,
+        color_index=color_index,
+        rim_color=rim_rgb_byte,
+        rim_alpha=int(rim_opacity * 255),
+        rim_thickness=rim_thickness,
+        lod=resolve_lod(lod),
+    )
+
+    # Render into one (T, H, W, 4) buffer instead of stacking frames afterwards
+    if out is not None:
+        check_output_buffer(out, T, None if lazy else (H, W))
+    elif not lazy and not stream:
+        out = np.empty((T, H, W, 4), dtype=np.uint8)
+
+    if workers is not None and workers != 1:
+        if lazy:
+            raise ValueError("workers= needs video and background as arrays, not lazy frame streams")
+        res_video = render_frames_parallel(
+            _draw_tracks_frame,
+            tracks,
+            visible,
+            background,
+            (H, W, 4),
+            workers,
+            desc="Drawing Tracks",
+            out=out,
+            **settings,
+        )
+        return iter(res_video) if stream else res_video
+
+    if paint_cache is None:
+        paint_cache = PAINT_CACHE
+    settings['cull_stats'] = cull_stats if cull_stats is not None else CULL_STATS
+
+    frames = iter_rendered_frames(_draw_tracks_frame, tracks, visible, background, paint_cache, "Drawing Tracks", settings, out)
+    if stream:
+        return frames
+
+    res_video = list(frames)
+    if out is not None:
+        return out
+    return np.array(res_video, dtype=np.uint8)
+
 
-    # Convert rim color to byte RGB
-    rim_rgba_float = rp.as_rgba_float_color(rim_color)
-    rim_rgb_byte = rp.float_color_to_byte_color(rim_rgba_float[:3])
-    rim_r, rim_g, rim_b = rim_rgb_byte
+def _draw_tracks_frame(
+    tracks,
+    visible,
+    bg_frame,
+    t,
+    *,
+    trail_length,
+    dot_size,
+    trail_size,
+    palette,
+    color_index,
+    rim_color,
+    rim_alpha,
+    rim_thickness,
+    lod=None,
+    out_frame=None,
+    trail_window=None,
+    paint_cache=PAINT_CACHE,
+    cull_stats=CULL_STATS,
+):
+    """
+    Render frame t of draw_tracks onto one background frame.
 
-    # Resolve dot and trail sizes
-    actual_dot_size = dot_size if dot_size is not None else size
-    actual_trail_size = trail_size if trail_size is not None else size
+    Only reads tracks[t-trail_length:t+1], visible and bg_frame, so frames can
+    be rendered independently (see render_frames_parallel). palette holds
+    byte RGB tuples indexed by color_index[t], and sizes are already
+    resolved (see resolve_sizes). Passing the same trail_window for
+    consecutive frames updates trails incrementally.
 
-    res_video = []
+    Returns:
+        out_frame (or a new array if None) of shape (H, W, 4), uint8.
+    """
+    H, W = bg_frame.shape[:2]
 
-    for t in tqdm(range(T), desc="Drawing Tracks"):
-        # Create RGBA surface from background frame
-        bg_frame = background[t]
-        rgba_frame = rp.as_rgba_image(bg_frame, copy=False)
+    # Create RGBA surface that draws straight into the output frame
+    with stage('draw_tracks.background'):
+        if out_frame is None:
+            out_frame = np.empty((H, W, 4), dtype=np.uint8)
+        rgba_frame = copy_background(bg_frame, out_frame)
 
         surface = skia.Surface.MakeRasterDirect(
             skia.ImageInfo.Make(W, H, skia.kRGBA_8888_ColorType, skia.kOpaque_AlphaType),
@@ -123,92 +257,208 @@ def draw_tracks(
         )
         canvas = surface.getCanvas()
 
-        # Determine historical range for this frame
-        first_frame = max(0, t - trail_length) if trail_length > 0 else t
-        trail_start = first_frame
-        trail_end = t + 1
-        trail_length_actual = trail_end - trail_start
-
-        for i in range(N):
-            # Current position and visibility
-            x_now = tracks[t, i, 0]
-            y_now = tracks[t, i, 1]
-            is_visible_now = visible[t, i].item()
-
-            # Draw trail
-            if trail_length > 0 and trail_length_actual >= 2:
-                # Collect visible points in the trail
-                points = []
-                for s in range(trail_start, trail_end):
-                    x_hist = tracks[s, i, 0]
-                    y_hist = tracks[s, i, 1]
-                    is_vis = visible[s, i].item()
-
-                    if is_vis and (x_hist != 0 or y_hist != 0):
-                        points.append((x_hist, y_hist))
-
-                # Draw segments between consecutive points
-                if len(points) >= 2:
-                    for idx in range(len(points) - 1):
-                        x1, y1 = points[idx]
-                        x2, y2 = points[idx + 1]
-
-                        # Subdivide segment for smooth tapering
-                        for sub in range(TRAIL_SUBSTEPS):
-                            t0 = sub / TRAIL_SUBSTEPS
-                            t1 = (sub + 1) / TRAIL_SUBSTEPS
-                            t_mid = (t0 + t1) / 2
-
-                            # Interpolate position
-                            px1 = x1 + (x2 - x1) * t0
-                            py1 = y1 + (y2 - y1) * t0
-                            px2 = x1 + (x2 - x1) * t1
-                            py2 = y1 + (y2 - y1) * t1
-
-                            # Progress through entire trail (0 to 1)
-                            progress = (idx + t_mid) / (len(points) - 1)
-
-                            # Taper: alpha and width increase from tail to head
-                            alpha = (progress ** 1.5)
-                            width = actual_trail_size * progress
-
-                            if alpha < 0.02:
-                                continue
-
-                            # Draw line segment
-                            paint = skia.Paint()
-                            paint.setAntiAlias(True)
-                            paint.setStyle(skia.Paint.kStroke_Style)
-                            paint.setStrokeWidth(width)
-                            paint.setStrokeCap(skia.Paint.kRound_Cap)
-                            paint.setColor(skia.Color(int(r), int(g), int(b), int(alpha * 255)))
-                            canvas.drawLine(px1, py1, px2, py2, paint)
-
-            # Draw current position dot
-            if is_visible_now and 0 <= x_now < W and 0 <= y_now < H:
-                radius = actual_dot_size
-
-                # Fill
-                fill_paint = skia.Paint()
-                fill_paint.setAntiAlias(True)
-                fill_paint.setStyle(skia.Paint.kFill_Style)
-                fill_paint.setColor(skia.Color(int(r), int(g), int(b), 255))
-                canvas.drawCircle(float(x_now), float(y_now), float(radius), fill_paint)
-
-                # Rim border
-                stroke_paint = skia.Paint()
-                stroke_paint.setAntiAlias(True)
-                stroke_paint.setStyle(skia.Paint.kStroke_Style)
-                stroke_paint.setStrokeWidth(rim_thickness)
-                stroke_paint.setColor(skia.Color(rim_r, rim_g, rim_b, int(rim_opacity * 255)))
-                canvas.drawCircle(float(x_now), float(y_now), float(radius), stroke_paint)
-
-        # Get RGBA frame (with alpha channel we drew on)
-        img = surface.makeImageSnapshot()
-        rgba = img.toarray()
-        res_video.append(rgba)
+    # Dot paints come from the shared pool, trail paints are fetched per frame
+    fill_paints = [paint_cache.get(rgb) for rgb in palette]
+    stroke_paint = paint_cache.get(rim_color, width=rim_thickness, alpha=rim_alpha, style='stroke')
+
+    with stage('draw_tracks.trail_window'):
+        if trail_window is None:
+            trail_window = TrailWindow(tracks, visible, trail_length)
+        points, num_points = trail_window.seek(t).packed()
+
+    # Reject off-screen trails before building their segments, then off-screen segments
+    dot_size = frame_sizes(dot_size, t)
+    trail_size = frame_sizes(trail_size, t)
+    with stage('draw_tracks.cull'):
+        in_frame = trails_in_frame(points, num_points, W, H, margin=trail_size / 2 + AA_MARGIN)
+        cull_stats.count('trails', in_frame[num_points >= 2])
+        kept = np.flatnonzero(in_frame)
+        points, num_points = points[kept], num_points[kept]
+
+    sample_index = num_samples = None
+    if lod is not None:
+        # Skip trails too short to see and collapse near-collinear samples
+        with stage('draw_tracks.lod'):
+            short = trail_window.lengths()[kept] < MIN_TRAIL_LENGTH
+            num_samples = num_points
+            points, num_points, sample_index = simplify_trails(points, np.where(short, 0, num_points), lod)
+            cull_stats.trails_dropped += int(np.count_nonzero(short))
+            cull_stats.segments_saved += int((num_samples - np.maximum(num_points, 1)).sum()) * TRAIL_SUBSTEPS
+
+    if np.ndim(trail_size):
+        trail_size = trail_size[kept]
+    with stage('draw_tracks.segments'):
+        track_ids, lines, widths, alphas = _trail_segments(points, num_points, trail_size, sample_index, num_samples)
+        keep = segments_in_frame(lines, widths, W, H)
+        cull_stats.count('segments', keep)
+        segments = kept[track_ids[keep]], lines[keep], widths[keep], alphas[keep]
+
+    with stage('draw_tracks.draw'):
+        _draw_frame(
+            canvas,
+            tracks[t],
+            visible[t],
+            segments,
+            W,
+            H,
+            dot_size,
+            palette,
+            color_index[t],
+            paint_cache,
+            fill_paints,
+            stroke_paint,
+            cull_stats,
+        )
 
-    return np.array(res_video, dtype=np.uint8)
+    return rgba_frame
+
+
+def _trail_segments(points, num_points, trail_size, sample_index=None, num_samples=None):
+    """
+    Compute every trail sub-segment of a frame in one vectorized pass.
+
+    Works on the whole (N, trail_length, TRAIL_SUBSTEPS) tensor at once: each
+    segment between consecutive usable samples is split into TRAIL_SUBSTEPS
+    pieces, and width and alpha taper with progress along the trail. Pieces
+    with alpha < 0.02 are discarded. Trails simplified by the LOD stage keep
+    the taper of the samples they replaced.
+
+    Args:
+        points: (N, L, 2) trail samples, oldest first (see TrailWindow.packed).
+        num_points: (N,) number of valid samples per track.
+        trail_size: Width of the trail at its head, a number or one per track.
+        sample_index: Optional (N, L) original index of each sample, for
+            simplified trails (see simplify_trails).
+        num_samples: (N,) original number of samples, required with sample_index.
+
+    Returns:
+        Tuple (track_ids, lines, widths, alphas) of M sub-segments ordered by
+        (track, segment, substep), which is the order they must be drawn in.
+        lines is (M, 4) holding x1, y1, x2, y2 and alphas are bytes (0-255).
+    """
+    L = points.shape[1]
+
+    # Sub-segment parameters, computed exactly like the scalar formulation
+    sub = np.arange(TRAIL_SUBSTEPS)
+    t0 = sub / TRAIL_SUBSTEPS
+    t1 = (sub + 1) / TRAIL_SUBSTEPS
+    t_mid = (t0 + t1) / 2
+
+    # Progress through entire trail (0 to 1), shape N L-1 S
+    idx = np.arange(L - 1)[None, :, None]
+    num_segments = (num_points - 1)[:, None, None]
+    if sample_index is None:
+        progress = (idx + t_mid) / np.maximum(num_segments, 1)
+    else:
+        start = sample_index[:, :-1, None]
+        span = sample_index[:, 1:, None] - start
+        progress = (start + span * t_mid) / np.maximum(num_samples - 1, 1)[:, None, None]
+
+    # Taper: alpha and width increase from tail to head
+    alpha = progress ** 1.5
+    keep = (idx < num_segments) & (alpha >= 0.02)
+
+    # Interpolate positions with the same promotion as tracks[s, i] * float
+    dtype = (points.dtype.type(0) * 0.0).dtype
+    p1 = points[:, :-1, None, :]
+    delta = points[:, 1:, None, :] - p1
+    starts = p1 + delta * t0.astype(dtype)[:, None]
+    ends = p1 + delta * t1.astype(dtype)[:, None]
+
+    track_ids = np.nonzero(keep)[0]
+    lines = np.concatenate([starts[keep], ends[keep]], axis=1)
+    if np.ndim(trail_size):
+        trail_size = np.asarray(trail_size)[:, None, None]
+    widths = (trail_size * progress)[keep]
+    alphas = (alpha[keep] * 255).astype(int)
+
+    return track_ids, lines, widths, alphas
+
+
+def _draw_frame(
+    canvas,
+    positions,
+    visible_now,
+    segments,
+    W,
+    H,
+    radius,
+    palette,
+    track_colors,
+    paint_cache,
+    fill_paints,
+    stroke_paint,
+    cull_stats=CULL_STATS,
+):
+    """
+    Issue one frame's trails and dots to a Skia canvas.
+
+    Each track's trail is drawn before its dot, and tracks are drawn in index
+    order, so overlapping tracks composite exactly as they always have. Every
+    paint comes from paint_cache, so nothing is allocated per segment: trail
+    paints are pooled by (color, alpha) only, and get each segment's exact
+    width set just before it is drawn, when it differs from that paint's
+    last width. Per-track sizes therefore add stroke width updates, not
+    paints.
+    radius is a number or one per track, and track_colors indexes palette
+    and fill_paints.
+
+    Trails are still issued as one drawLine per sub-segment, the same number
+    of draw calls as the original loop, because pixel-exact output needs each
+    sub-segment stroked and blended on its own, in order: merging segments
+    into one path unions their overlaps, which the tapering alphas would
+    show. drawPoints(kLines_PointMode) keeps that order and the exact
+    pixels, but building its skia.Point list costs more than the calls it
+    saves. Per-segment stroking in Skia therefore dominates, and caps the
+    speedup over the original loop at about 1.5x (see
+    draw_tracks_benchmark.benchmark); only the geometry, culling and paints
+    around the calls are vectorized.
+    """
+    N = len(positions)
+    track_ids, lines, widths, alphas = segments
+
+    x_now = positions[:, 0]
+    y_now = positions[:, 1]
+    visible_now = visible_now.astype(bool)
+    has_dot = visible_now & (0 <= x_now) & (x_now < W) & (0 <= y_now) & (y_now < H)
+    cull_stats.count('dots', has_dot[visible_now])
+
+    bounds = np.searchsorted(track_ids, np.arange(N + 1))
+    has_trail = bounds[1:] > bounds[:-1]
+
+    # One pooled paint per distinct (color, alpha) in this frame
+    colors = track_colors[track_ids]
+    keys, paint_index = np.unique(np.stack([colors, alphas]), axis=1, return_inverse=True)
+    paint_index = paint_index.reshape(-1)
+    trail_paints = [
+        paint_cache.get(palette[color], width=None, alpha=alpha, style='stroke', cap='round')
+        for color, alpha in keys.T.tolist()
+    ]
+
+    # A segment sets its paint's width unless the previous segment drawn with that paint had the same width
+    order = np.argsort(paint_index, kind='stable')
+    same_as_previous = (paint_index[order][1:] == paint_index[order][:-1]) & (widths[order][1:] == widths[order][:-1])
+    sets_width = np.ones(len(widths), dtype=bool)
+    sets_width[order[1:]] = ~same_as_previous
+
+    bounds = bounds.tolist()
+    lines = lines.tolist()
+    segment_paints = [trail_paints[k] for k in paint_index.tolist()]
+    new_widths = np.where(sets_width, widths, np.nan).tolist()
+    radii = np.broadcast_to(radius, (N,)).astype(float).tolist()
+    track_colors = track_colors.tolist()
+
+    for i in np.flatnonzero(has_trail | has_dot).tolist():
+        for j in range(bounds[i], bounds[i + 1]):
+            paint = segment_paints[j]
+            if new_widths[j] == new_widths[j]:  # Not NaN
+                paint.setStrokeWidth(new_widths[j])
+            canvas.drawLine(*lines[j], paint)
+
+        if has_dot[i]:
+            x, y = float(x_now[i]), float(y_now[i])
+            canvas.drawCircle(x, y, radii[i], fill_paints[track_colors[i]])
+            canvas.drawCircle(x, y, radii[i], stroke_paint)
 
 
 def demo():
@@ -0,0 +1,382 @@
+"""
+Benchmarks for draw_tracks and draw_tracks_skia.
+
+Times the vectorized trail engine against the original per-point loop on
+synthetic CoTracker-like data, and checks that both produce the same pixels.
+A microbenchmark compares drawing skia ribbons through one Skia surface per
+trail (rp.skia_draw_trail) against one surface per frame (draw_tracks_skia).
+
+Run as a module of the installed package:
+    python -m rp.git.Figures.track_trails.draw_tracks_benchmark
+
+See benchmark_suite.py for the full grid of cases with JSON/CSV reports.
+"""
+
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import skia
+
+import rp
+
+from .draw_tracks import draw_tracks, TRAIL_SUBSTEPS
+from .draw_tracks_mesh import _trail_paint, _trail_vertices
+from .paint_cache import PaintCache
+
+
+def synthetic_tracks(T=60, N=1000, H=480, W=720, occlusion=0.1, seed=0, cotracker=False):
+    """
+    Generate random-walk tracks, occlusion masks and a noise video.
+
+    With cotracker=True the data looks like CoTracker grid output instead:
+    query points start on an evenly spaced grid, follow a smoothly drifting
+    camera plus slow per-point motion (so some leave the frame), and are
+    occluded in runs of about 8 frames rather than independently per frame.
+    The video is then low-resolution noise upsampled to the frame size and
+    panned, with the large smooth regions of real footage.
+
+    Args:
+        T, N: Number of frames and tracks.
+        H, W: Frame size in pixels.
+        occlusion: Fraction of (frame, track) samples that are occluded.
+        seed: Random seed.
+        cotracker: Generate CoTracker-like data instead of random walks.
+
+    Returns:
+        (tracks, visible, video) with shapes (T, N, 2) float32, (T, N) bool
+        and (T, H, W, 3) uint8.
+    """
+    rng = np.random.default_rng(seed)
+    if not cotracker:
+        start = rng.uniform(0, [W, H], size=(1, N, 2))
+        steps = rng.normal(0, 2, size=(T, N, 2))
+        tracks = (start + np.cumsum(steps, axis=0)).astype(np.float32)
+        visible = rng.random((T, N)) >= occlusion
+        video = rng.integers(0, 256, size=(T, H, W, 3), dtype=np.uint8)
+        return tracks, visible, video
+
+    # Grid of query points covering the frame, trimmed to N
+    rows = max(1, int(round(np.sqrt(N * H / W))))
+    cols = -(-N // rows)
+    ys, xs = np.meshgrid((np.arange(rows) + 0.5) * H / rows, (np.arange(cols) + 0.5) * W / cols, indexing='ij')
+    start = np.stack([xs.ravel(), ys.ravel()], axis=1)[:N]
+
+    # Smooth camera drift shared by all points, plus slow per-point motion
+    camera = np.cumsum(np.cumsum(rng.normal(0, 0.3, size=(T, 1, 2)), axis=0), axis=0)
+    motion = np.cumsum(rng.normal(0, 1.5, size=(T, N, 2)), axis=0)
+    tracks = (start + camera + motion).astype(np.float32)
+
+    # Two-state Markov chain per track: occlusions last about 8 frames
+    leave = 1 / 8
+    enter = leave * occlusion / max(1 - occlusion, 1e-9)
+    occluded = np.empty((T, N), dtype=bool)
+    occluded[0] = rng.random(N) < occlusion
+    flips = rng.random((T, N))
+    for t in range(1, T):
+        occluded[t] = np.where(occluded[t - 1], flips[t] >= leave, flips[t] < enter)
+
+    # Noise at 1/24 of the frame size, upsampled and panned 24 pixels per frame
+    small = rng.random((max(2, H // 24), max(2, W // 24) + T, 3))
+    image = rp.as_byte_image(rp.cv_resize_image(small, (H, W + T * 24)), copy=False)
+    video = np.stack([image[:, 24 * t:24 * t + W] for t in range(T)])
+    return tracks, ~occluded, video
+
+
+@contextmanager
+def count_surfaces():
+    """
+    Count the Skia surfaces created inside a with block.
+
+    skia.Surface is swapped for a subclass that counts its constructor and
+    MakeRasterDirect calls, which is how rp and the renderers make surfaces.
+
+    Yields:
+        A dict whose 'surfaces' entry holds the count so far.
+    """
+    counts = dict(surfaces=0)
+    Surface = skia.Surface
+
+    class CountingSurface(Surface):
+        def __init__(self, *args, **kwargs):
+            counts['surfaces'] += 1
+            super().__init__(*args, **kwargs)
+
+        @staticmethod
+        def MakeRasterDirect(*args, **kwargs):
+            counts['surfaces'] += 1
+            return Surface.MakeRasterDirect(*args, **kwargs)
+
+    skia.Surface = CountingSurface
+    try:
+        yield counts
+    finally:
+        skia.Surface = Surface
+
+
+def draw_tracks_loop(
+    tracks,
+    video,
+    visible=None,
+    color='white',
+    trail_length=0,
+    dot_size=None,
+    trail_size=None,
+    size=4,
+    background=None,
+    rim_opacity=0.5,
+    rim_color='white',
+    rim_thickness=1,
+):
+    """
+    The original scalar implementation of draw_tracks, kept as a reference.
+
+    Walks every frame, point, historical frame and sub-segment in Python and
+    allocates a fresh skia.Paint for each line. Same arguments and output as
+    draw_tracks.
+    """
+    tracks = rp.as_numpy_array(tracks)
+    video = rp.as_numpy_array(video)
+    T, N, H, W, C = rp.validate_tensor_shapes(
+        tracks="T N 2",
+        video="T H W C",
+        XY=2,
+        return_dims="T N H W C",
+    )
+
+    if visible is None:
+        visible = np.ones((T, N), dtype=bool)
+    visible = rp.as_numpy_array(visible)
+
+    if background is None:
+        background = video
+
+    r, g, b = rp.float_color_to_byte_color(rp.as_rgba_float_color(color)[:3])
+    rim_r, rim_g, rim_b = rp.float_color_to_byte_color(rp.as_rgba_float_color(rim_color)[:3])
+
+    actual_dot_size = dot_size if dot_size is not None else size
+    actual_trail_size = trail_size if trail_size is not None else size
+
+    res_video = []
+
+    for t in range(T):
+        rgba_frame = rp.as_rgba_image(background[t], copy=False)
+        surface = skia.Surface.MakeRasterDirect(
+            skia.ImageInfo.Make(W, H, skia.kRGBA_8888_ColorType, skia.kOpaque_AlphaType),
+            rgba_frame
+        )
+        canvas = surface.getCanvas()
+
+        trail_start = max(0, t - trail_length) if trail_length > 0 else t
+        trail_end = t + 1
+        trail_length_actual = trail_end - trail_start
+
+        for i in range(N):
+            x_now = tracks[t, i, 0]
+            y_now = tracks[t, i, 1]
+            is_visible_now = visible[t, i].item()
+
+            if trail_length > 0 and trail_length_actual >= 2:
+                points = []
+                for s in range(trail_start, trail_end):
+                    x_hist = tracks[s, i, 0]
+                    y_hist = tracks[s, i, 1]
+                    if visible[s, i].item() and (x_hist != 0 or y_hist != 0):
+                        points.append((x_hist, y_hist))
+
+                for idx in range(len(points) - 1):
+                    x1, y1 = points[idx]
+                    x2, y2 = points[idx + 1]
+
+                    for sub in range(TRAIL_SUBSTEPS):
+                        t0 = sub / TRAIL_SUBSTEPS
+                        t1 = (sub + 1) / TRAIL_SUBSTEPS
+                        t_mid = (t0 + t1) / 2
+
+                        px1 = x1 + (x2 - x1) * t0
+                        py1 = y1 + (y2 - y1) * t0
+                        px2 = x1 + (x2 - x1) * t1
+                        py2 = y1 + (y2 - y1) * t1
+
+                        progress = (idx + t_mid) / (len(points) - 1)
+                        alpha = (progress ** 1.5)
+                        width = actual_trail_size * progress
+
+                        if alpha < 0.02:
+                            continue
+
+                        paint = skia.Paint()
+                        paint.setAntiAlias(True)
+                        paint.setStyle(skia.Paint.kStroke_Style)
+                        paint.setStrokeWidth(width)
+                        paint.setStrokeCap(skia.Paint.kRound_Cap)
+                        paint.setColor(skia.Color(int(r), int(g), int(b), int(alpha * 255)))
+                        canvas.drawLine(px1, py1, px2, py2, paint)
+
+            if is_visible_now and 0 <= x_now < W and 0 <= y_now < H:
+                radius = actual_dot_size
+
+                fill_paint = skia.Paint()
+                fill_paint.setAntiAlias(True)
+                fill_paint.setStyle(skia.Paint.kFill_Style)
+                fill_paint.setColor(skia.Color(int(r), int(g), int(b), 255))
+                canvas.drawCircle(float(x_now), float(y_now), float(radius), fill_paint)
+
+                stroke_paint = skia.Paint()
+                stroke_paint.setAntiAlias(True)
+                stroke_paint.setStyle(skia.Paint.kStroke_Style)
+                stroke_paint.setStrokeWidth(rim_thickness)
+                stroke_paint.setColor(skia.Color(rim_r, rim_g, rim_b, int(rim_opacity * 255)))
+                canvas.drawCircle(float(x_now), float(y_now), float(radius), stroke_paint)
+
+        res_video.append(surface.makeImageSnapshot().toarray())
+
+    return np.array(res_video, dtype=np.uint8)
+
+
+def benchmark(T=30, N=1000, H=480, W=720, trail_length=10, seed=0):
+    """
+    Time draw_tracks against draw_tracks_loop and report frames/second.
+
+    Both issue one drawLine per trail sub-segment, which pixel-exact output
+    requires (see draw_tracks._draw_frame), so the speedup is capped by
+    Skia's stroking of those segments at about 1.5x.
+
+    Returns:
+        dict with the fps of both renderers, the speedup, the largest
+        per-pixel difference between their outputs and the number of paints
+        the vectorized renderer allocated.
+    """
+    tracks, visible, video = synthetic_tracks(T, N, H, W, seed=seed)
+    kwargs = dict(color='green', trail_length=trail_length)
+
+    start = time.perf_counter()
+    expected = draw_tracks_loop(tracks, video, visible, **kwargs)
+    loop_seconds = time.perf_counter() - start
+
+    paint_cache = PaintCache()
+    start = time.perf_counter()
+    actual = draw_tracks(tracks, video, visible, paint_cache=paint_cache, **kwargs)
+    vectorized_seconds = time.perf_counter() - start
+
+    max_diff = int(np.abs(actual.astype(int) - expected.astype(int)).max())
+
+    result = dict(
+        T=T,
+        N=N,
+        H=H,
+        W=W,
+        trail_length=trail_length,
+        loop_fps=T / loop_seconds,
+        vectorized_fps=T / vectorized_seconds,
+        speedup=loop_seconds / vectorized_seconds,
+        max_pixel_diff=max_diff,
+        paint_allocations=paint_cache.allocations,
+        paint_hits=paint_cache.hits,
+    )
+
+    print(f"draw_tracks benchmark: T={T} N={N} {W}x{H} trail_length={trail_length}")
+    print(f"    loop:       {result['loop_fps']:8.2f} frames/sec")
+    print(f"    vectorized: {result['vectorized_fps']:8.2f} frames/sec")
+    print(f"    speedup:    {result['speedup']:8.2f}x")
+    print(f"    max pixel difference: {max_diff}")
+    print(f"    paints allocated: {paint_cache.allocations} ({paint_cache.hits} reused)")
+
+    return result
+
+
+def surface_benchmark(N=200, H=480, W=720, supersample=2, trail_length=10, repeats=5, seed=0):
+    """
+    Time one frame of trail ribbons drawn with a surface per trail versus one surface per frame.
+
+    rp.skia_draw_trail wraps the canvas in a new Skia surface, texture image
+    and shader for every trail it draws, so that setup is paid N times per
+    frame. draw_tracks_skia sets them up once per frame and only builds each
+    trail's vertices.
+
+    Returns:
+        dict with the seconds per frame of both approaches, the speedup, the
+        number of surfaces each created per frame (counted with
+        count_surfaces during an untimed run) and the largest per-pixel
+        difference between their outputs.
+    """
+    ss = supersample
+    tracks, _, _ = synthetic_tracks(trail_length + 1, N, H, W, occlusion=0, seed=seed)
+    contours = [
+        rp.evenly_split_path(tracks[:, i] * ss, (trail_length + 1) * 4, loop=False).astype(np.float32)
+        for i in range(N)
+    ]
+    radii = [4 * ss * np.linspace(0, 1, len(contour), dtype=np.float32) ** 1.5 for contour in contours]
+
+    texture = np.full((8, 256, 4), 255, dtype=np.uint8)
+    texture[..., 3] = np.linspace(255, 0, 256).astype(np.uint8)
+
+    def per_trail():
+        canvas = np.zeros((H * ss, W * ss, 4), dtype=np.uint8)
+        for contour, radius in zip(contours, radii):
+            canvas = rp.skia_draw_trail(
+                canvas,
+                contour,
+                texture,
+                copy=False,
+                inner_radius=radius,
+                outer_radius=radius,
+                interp='bilinear',
+                mipmap=False,
+            )
+        return canvas
+
+    def per_frame():
+        canvas = np.zeros((H * ss, W * ss, 4), dtype=np.uint8)
+        surface = skia.Surface.MakeRasterDirect(
+            skia.ImageInfo.Make(W * ss, H * ss, skia.kRGBA_8888_ColorType, skia.kUnpremul_AlphaType),
+            canvas
+        )
+        skia_canvas = surface.getCanvas()
+        paint = _trail_paint(texture)
+        for contour, radius in zip(contours, radii):
+            skia_canvas.drawVertices(_trail_vertices(contour, radius, texture.shape), paint, skia.BlendMode.kModulate)
+        del skia_canvas, surface
+        return canvas
+
+    surfaces = {}
+    outputs = {}
+    for name, draw in [('per_trail', per_trail), ('per_frame', per_frame)]:
+        with count_surfaces() as counts:
+            outputs[name] = draw()
+        surfaces[name] = counts['surfaces']
+    expected, actual = outputs['per_trail'], outputs['per_frame']
+    max_diff = int(np.abs(actual.astype(int) - expected.astype(int)).max())
+
+    seconds = {}
+    for name, draw in [('per_trail', per_trail), ('per_frame', per_frame)]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            draw()
+        seconds[name] = (time.perf_counter() - start) / repeats
+
+    result = dict(
+        N=N,
+        H=H,
+        W=W,
+        supersample=ss,
+        per_trail_seconds=seconds['per_trail'],
+        per_frame_seconds=seconds['per_frame'],
+        speedup=seconds['per_trail'] / seconds['per_frame'],
+        per_trail_surfaces=surfaces['per_trail'],
+        per_frame_surfaces=surfaces['per_frame'],
+        max_pixel_diff=max_diff,
+    )
+
+    print(f"surface benchmark: N={N} {W}x{H} supersample={ss}")
+    print(f"    surface per trail: {1000 * result['per_trail_seconds']:8.2f} ms/frame, surfaces created: {result['per_trail_surfaces']}")
+    print(f"    surface per frame: {1000 * result['per_frame_seconds']:8.2f} ms/frame, surfaces created: {result['per_frame_surfaces']}")
+    print(f"    speedup:           {result['speedup']:8.2f}x")
+    print(f"    max pixel difference: {max_diff}")
+
+    return result
+
+
+if __name__ == '__main__':
+    benchmark()
+    surface_benchmark()
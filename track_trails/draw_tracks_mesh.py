@@ -1,17 +1,31 @@
 """
 Track visualization using skia_draw_trail for smooth textured ribbons.
 
-Uses rp.skia_draw_trail to render tracks as tapered, gradient trails.
+Renders tracks as tapered, gradient trails with the same ribbon meshes as
+rp.skia_draw_trail, drawn through one Skia surface per frame.
 """
 
 import numpy as np
-from tqdm import tqdm
 
 import rp
 
+from .culling import AA_MARGIN, CULL_STATS, trails_in_frame
+from .paint_cache import PAINT_CACHE
+from .lod import MIN_TRAIL_LENGTH, resolve_lod, simplify_trails
+from .frame_source import check_output_buffer, copy_background, is_frame_stream, iter_rendered_frames
+from .parallel import render_frames_parallel
+from .resample import resample_trails
+from .ribbons import MAX_RIBBON_VERTICES, build_ribbons, gradient_colors
+from ..profiling import stage
+from .styles import frame_sizes, resolve_colors, resolve_sizes
+from .trail_window import TrailWindow
+
 # Supersampling factor for antialiasing (2 = 2x2 = 4 samples per pixel)
 SUPERSAMPLE = 2
 
+# Rows of vertices across each trail ribbon, as in rp.skia_draw_trail
+RIBBON_SUBDIVS = 8
+
 
 def draw_tracks_skia(
     tracks,
@@ -27,6 +41,14 @@ def draw_tracks_skia(
     rim_color='white',
     rim_thickness=1,
     supersample=SUPERSAMPLE,
+    supersample_mode='background',
+    batched=False,
+    lod=False,
+    paint_cache=None,
+    cull_stats=None,
+    workers=None,
+    stream=False,
+    out=None,
 ):
     """
     Draw tracked points and motion trails using skia_draw_trail.
@@ -37,35 +59,76 @@ def draw_tracks_skia(
     Args:
         tracks: numpy array of shape (T, N, 2) containing (x, y) coordinates.
                T = frames, N = number of points.
-        video: numpy array of shape (T, H, W, C) as reference video (uint8, RGB).
+        video: numpy array of shape (T, H, W, C) as reference video (uint8, RGB), or a
+               lazy iterable of frames (e.g. a generator or video reader) that is read
+               one frame at a time.
         visible: numpy array of shape (T, N) with boolean/numeric visibility.
                 If None, all points are visible.
         color: Color specification (string, hex, tuple). Passed to rp.as_rgba_float_color.
+               For per-track colors, pass N specs, an (N, 3|4) array of float colors,
+               or a (T, N) / (T, N, 3|4) array to also vary them over time.
         trail_length: Number of historical frames to show in trail (0 = dots only).
         dot_size: Radius multiplier for current position dot. If None, uses size parameter.
+                  May be an (N,) or (T, N) array of per-track sizes.
         trail_size: Width multiplier for trail lines. If None, uses size parameter.
+                    May be an (N,) or (T, N) array of per-track sizes.
         size: Base size for both dot and trail (default 4). Overridden by dot_size/trail_size.
         background: Background frames to composite onto (default: original video).
+                    Like video, may be a lazy iterable of frames.
         rim_opacity: Opacity of dot border (0-1, default 0.5).
         rim_color: Color of dot border (default 'white').
         rim_thickness: Thickness of dot border in pixels (default 1).
         supersample: Supersampling factor for antialiasing (default 2). Set to 1 to disable.
+        supersample_mode: How supersampled frames are built (ignored when supersample=1).
+                          'background' (default) upsamples each background frame, draws on
+                          it and downsamples the result. 'overlay' draws into a transparent
+                          supersampled layer, box-filters it down and composites it over the
+                          original background, which is much cheaper and keeps the
+                          background sharp.
+        batched: If True, build every trail of a frame into one vertex buffer with
+                 per-vertex colors and draw them in a few drawVertices calls, then draw
+                 the dots on top. Much faster with thousands of tracks; the texture is
+                 sampled per vertex and dots always cover trails.
+        lod: Level-of-detail simplification for dense grids (default False = off).
+             True collapses samples within LOD_TOLERANCE pixels of a straight line and
+             skips trails shorter than MIN_TRAIL_LENGTH pixels before paths are
+             resampled; a number sets the tolerance in pixels. Resampled segments
+             saved are counted in cull_stats.
+        paint_cache: PaintCache to take dot and trail paints from (default: the shared PAINT_CACHE).
+        cull_stats: CullStats that counts the trails and dots that were culled for lying
+                    outside the frame versus drawn (default: the shared CULL_STATS).
+                    Workers count into their own process-local CULL_STATS.
+        workers: Number of processes to render frames with (default None = serial,
+                 -1 = every CPU). Needs video and background as arrays.
+        stream: If True, return a generator that yields each (H, W, 4) frame as soon as
+                it is drawn instead of stacking the whole video. Combined with a lazy
+                video/background, memory stays bounded regardless of clip length.
+        out: Optional preallocated (T, H, W, 4) uint8 array, e.g. a np.memmap, that
+             frames are written into instead of being stacked at the end.
 
     Returns:
-        numpy array of shape (T, H, W, 4) with RGBA frames ready for video output.
+        numpy array of shape (T, H, W, 4) with RGBA frames ready for video output
+        (out itself if given). If stream=True, an iterator over those frames instead.
     """
-    import skia
-
     # Convert torch tensors to numpy
     tracks = rp.as_numpy_array(tracks)
-    video = rp.as_numpy_array(video)
 
-    T, N, H, W, C = rp.validate_tensor_shapes(
-        tracks="T N 2",
-        video="T H W C",
-        XY=2,
-        return_dims="T N H W C",
-    )
+    # Frame streams are consumed lazily, so only the tracks can be validated up front
+    lazy = is_frame_stream(video) or is_frame_stream(background)
+    if lazy:
+        T, N = rp.validate_tensor_shapes(
+            tracks="T N 2",
+            XY=2,
+            return_dims="T N",
+        )
+    else:
+        video = rp.as_numpy_array(video)
+        T, N, H, W, C = rp.validate_tensor_shapes(
+            tracks="T N 2",
+            video="T H W C",
+            XY=2,
+            return_dims="T N H W C",
+        )
 
     if visible is None:
         visible = np.ones((T, N), dtype=bool)
@@ -75,140 +138,393 @@ def draw_tracks_skia(
     if background is None:
         background = video
 
-    # Supersampled dimensions
+    ss = supersample
+    if supersample_mode not in ('background', 'overlay'):
+        raise ValueError(f"supersample_mode must be 'background' or 'overlay', but got {supersample_mode!r}")
+
+    with stage('draw_tracks_skia.setup'):
+        # Get colors as a float RGBA palette and each track's entry in it
+        palette, color_index = resolve_colors(color, T, N)
+        rim_rgba_float = rp.as_rgba_float_color(rim_color)
+
+        # Convert to byte RGB for skia dots
+        palette_bytes = [rp.float_color_to_byte_color(rgba_float[:3]) for rgba_float in palette]
+        rim_rgb_byte = rp.float_color_to_byte_color(rim_rgba_float[:3])
+
+        # Resolve dot and trail sizes (scaled for supersampling)
+        actual_dot_size = resolve_sizes(dot_size if dot_size is not None else size, T, N, 'dot_size') * ss
+        actual_trail_size = resolve_sizes(trail_size if trail_size is not None else size, T, N, 'trail_size') * ss
+        actual_rim_thickness = rim_thickness * ss
+        trail_textures = _trail_textures(palette)
+
+    settings = dict(
+        trail_length=trail_length,
+        supersample=ss,
+        supersample_mode=supersample_mode,
+        batched=batched,
+        dot_size=actual_dot_size,
+        trail_size=actual_trail_size,
+        palette=palette_bytes,
+        color_index=color_index,
+        rim_color=rim_rgb_byte,
+        rim_alpha=int(rim_opacity * 255),
+        rim_thickness=actual_rim_thickness,
+        trail_textures=trail_textures,
+        lod=resolve_lod(lod),
+    )
+
+    # Render into one (T, H, W, 4) buffer instead of stacking frames afterwards
+    if out is not None:
+        check_output_buffer(out, T, None if lazy else (H, W))
+    elif not lazy and not stream:
+        out = np.empty((T, H, W, 4), dtype=np.uint8)
+
+    if workers is not None and workers != 1:
+        if lazy:
+            raise ValueError("workers= needs video and background as arrays, not lazy frame streams")
+        res_video = render_frames_parallel(
+            _draw_tracks_skia_frame,
+            tracks,
+            visible,
+            background,
+            (H, W, 4),
+            workers,
+            desc="Drawing Tracks (Skia)",
+            out=out,
+            **settings,
+        )
+        return iter(res_video) if stream else res_video
+
+    if paint_cache is None:
+        paint_cache = PAINT_CACHE
+    settings['cull_stats'] = cull_stats if cull_stats is not None else CULL_STATS
+
+    frames = iter_rendered_frames(_draw_tracks_skia_frame, tracks, visible, background, paint_cache, "Drawing Tracks (Skia)", settings, out)
+    if stream:
+        return frames
+
+    res_video = list(frames)
+    if out is not None:
+        return out
+    return np.array(res_video, dtype=np.uint8)
+
+
+def _draw_tracks_skia_frame(
+    tracks,
+    visible,
+    bg_frame,
+    t,
+    *,
+    trail_length,
+    supersample,
+    supersample_mode='background',
+    batched=False,
+    dot_size,
+    trail_size,
+    palette,
+    color_index,
+    rim_color,
+    rim_alpha,
+    rim_thickness,
+    trail_textures,
+    lod=None,
+    out_frame=None,
+    trail_window=None,
+    paint_cache=PAINT_CACHE,
+    cull_stats=CULL_STATS,
+):
+    """
+    Render frame t of draw_tracks_skia onto one background frame.
+
+    Only reads tracks[t-trail_length:t+1], visible and bg_frame, so frames can
+    be rendered independently (see render_frames_parallel). Sizes are already
+    resolved and scaled by supersample. palette holds byte RGB tuples and
+    trail_textures the matching trail textures, both indexed by
+    color_index[t]. Passing the same trail_window for consecutive frames
+    updates trails incrementally.
+
+    Returns:
+        out_frame (or a new array if None) of shape (H, W, 4), uint8.
+    """
+    import skia
+
+    H, W = bg_frame.shape[:2]
     ss = supersample
     H_ss, W_ss = H * ss, W * ss
 
-    # Get colors as float RGBA
-    rgba_float = rp.as_rgba_float_color(color)
-    rim_rgba_float = rp.as_rgba_float_color(rim_color)
-
-    # Convert to byte RGB for skia dots
-    rgb_byte = rp.float_color_to_byte_color(rgba_float[:3])
-    r, g, b = rgb_byte
-    rim_rgb_byte = rp.float_color_to_byte_color(rim_rgba_float[:3])
-    rim_r, rim_g, rim_b = rim_rgb_byte
-
-    # Resolve dot and trail sizes (scaled for supersampling)
-    actual_dot_size = (dot_size if dot_size is not None else size) * ss
-    actual_trail_size = (trail_size if trail_size is not None else size) * ss
-    actual_rim_thickness = rim_thickness * ss
-
-    # Create trail texture for skia_draw_trail
-    # The texture gets transposed internally: texture.transpose(1,0,2)
-    # After transpose: original width -> new height (U, along trail), original height -> new width (V, across ribbon)
-    # So gradient along original WIDTH maps to U (along the trail path)
+    # Dot paints are shared by every point with the same color
+    fill_paints = [paint_cache.get(rgb) for rgb in palette]
+    stroke_paint = paint_cache.get(rim_color, width=rim_thickness, alpha=rim_alpha, style='stroke')
+
+    # Create supersampled RGBA canvas from background frame, or a transparent
+    # supersampled overlay. Without supersampling, draw straight into the output frame.
+    with stage('draw_tracks_skia.background'):
+        if out_frame is None:
+            out_frame = np.empty((H, W, 4), dtype=np.uint8)
+        overlay = ss > 1 and supersample_mode == 'overlay'
+        if overlay:
+            copy_background(bg_frame, out_frame)
+            canvas = np.zeros((H_ss, W_ss, 4), dtype=np.uint8)
+        elif ss > 1:
+            bg_frame_ss = rp.resize_image(bg_frame, (H_ss, W_ss))
+            canvas = np.ascontiguousarray(rp.as_byte_image(rp.as_rgba_image(bg_frame_ss, copy=True), copy=False))
+        else:
+            canvas = copy_background(bg_frame, out_frame)
+
+        # One surface per frame: every trail and dot is drawn through this canvas
+        surface = skia.Surface.MakeRasterDirect(
+            skia.ImageInfo.Make(W_ss, H_ss, skia.kRGBA_8888_ColorType, skia.kUnpremul_AlphaType),
+            canvas
+        )
+        skia_canvas = surface.getCanvas()
+
+    # Per-track styles in this frame
+    track_colors = color_index[t]
+    dot_size = np.broadcast_to(frame_sizes(dot_size, t), track_colors.shape)
+    trail_size = np.broadcast_to(frame_sizes(trail_size, t), track_colors.shape)
+
+    # Visible samples of every trail, maintained incrementally across frames
+    with stage('draw_tracks_skia.trail_window'):
+        if trail_window is None:
+            trail_window = TrailWindow(tracks, visible, trail_length)
+        points, num_points = trail_window.seek(t).packed()
+
+    # Off-screen trails are rejected before any path is resampled
+    with stage('draw_tracks_skia.cull'):
+        has_trail = trails_in_frame(points, num_points, W_ss, H_ss, margin=trail_size + AA_MARGIN, scale=ss)
+        cull_stats.count('trails', has_trail[num_points >= 2])
+
+    if lod is not None:
+        # Skip trails too short to see and collapse near-collinear samples.
+        # Each trail is resampled to max(4 * samples, 20) vertices below.
+        with stage('draw_tracks_skia.lod'):
+            resampled = np.maximum(num_points * 4, 20)
+            short = has_trail & (trail_window.lengths() < MIN_TRAIL_LENGTH)
+            has_trail &= ~short
+            points, num_points, _ = simplify_trails(points, np.where(has_trail, num_points, 0), lod)
+            cull_stats.trails_dropped += int(np.count_nonzero(short))
+            cull_stats.segments_saved += int(
+                np.where(short, resampled - 1, 0).sum()
+                + np.where(has_trail, resampled - np.maximum(num_points * 4, 20), 0).sum()
+            )
+
+    # Current positions and visibility (scaled for supersampling)
+    x_now = tracks[t, :, 0] * ss
+    y_now = tracks[t, :, 1] * ss
+    visible_now = visible[t].astype(bool)
+    has_dot = visible_now & (0 <= x_now) & (x_now < W_ss) & (0 <= y_now) & (y_now < H_ss)
+    cull_stats.count('dots', has_dot[visible_now])
+
+    # Resample every drawn trail evenly at once (scaled for supersampling), for smoother rendering
+    with stage('draw_tracks_skia.resample'):
+        num_resampled = np.where(has_trail, np.maximum(num_points * 4, 20), 0)
+        contours = resample_trails((points * ss).astype(np.float32), num_points, num_resampled)
+
+    with stage('draw_tracks_skia.draw'):
+        # Batched trails all go down first, in as few drawVertices calls as possible
+        if batched:
+            batch = _batched_trail_vertices(
+                contours[has_trail],
+                num_resampled[has_trail],
+                trail_size[has_trail],
+                trail_textures,
+                track_colors[has_trail],
+            )
+            # kDst keeps the per-vertex colors, so any opaque paint draws them unchanged
+            batch_paint = paint_cache.get((255, 255, 255))
+            for vertices in batch:
+                skia_canvas.drawVertices(vertices, batch_paint, skia.BlendMode.kDst)
+        draw_trail = has_trail & (not batched)
+
+        for i in np.flatnonzero(draw_trail | has_dot).tolist():
+            # Draw trail as a textured ribbon
+            if draw_trail[i]:
+                contour = contours[i, :num_resampled[i]]
+
+                # Taper: inner/outer radius go from 0 at tail to trail_size at head
+                progress = np.linspace(0, 1, len(contour), dtype=np.float32)
+                taper = progress ** 1.5
+                radius = float(trail_size[i]) * taper
+
+                texture = trail_textures[track_colors[i]]
+                skia_canvas.drawVertices(
+                    _trail_vertices(contour, radius, texture.shape),
+                    _trail_paint(texture, paint_cache),
+                    skia.BlendMode.kModulate,
+                )
+
+            # Draw current position dot
+            if has_dot[i]:
+                # Fill
+                skia_canvas.drawCircle(float(x_now[i]), float(y_now[i]), float(dot_size[i]), fill_paints[track_colors[i]])
+
+                # Rim border
+                skia_canvas.drawCircle(float(x_now[i]), float(y_now[i]), float(dot_size[i]), stroke_paint)
+
+    del skia_canvas, surface
+
+    # Downsample back to original resolution
+    with stage('draw_tracks_skia.downsample'):
+        if overlay:
+            return _composite_overlay(canvas, ss, out_frame)
+        if ss > 1:
+            canvas = rp.resize_image(canvas, (H, W))
+            canvas = rp.as_byte_image(canvas, copy=False)
+
+        if canvas is not out_frame:
+            out_frame[...] = canvas
+    return out_frame
+
+
+def _batched_trail_vertices(contours, lengths, trail_size, trail_textures, texture_index):
+    """
+    Build every trail's tapered ribbon at once with build_ribbons.
+
+    contours is (K, M, 2) with lengths[k] points in row k (see resample_trails),
+    trail_size is each trail's width and texture_index its entry in
+    trail_textures. Radii taper exactly like the per-trail ribbons, and
+    colors are the texture sampled at each vertex's position along its trail.
+    """
+    if not len(lengths):
+        return []
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    progress = ((np.arange(lengths.sum()) - starts) / np.repeat(lengths - 1, lengths)).astype(np.float32)
+
+    radius = np.repeat(trail_size, lengths) * progress ** 1.5
+    colors = gradient_colors(trail_textures, progress, np.repeat(texture_index, lengths))
+    points = contours[np.arange(contours.shape[1]) < lengths[:, None]]
+    return build_ribbons(points, radius, colors, lengths)
+
+
+def _trail_textures(palette):
+    """
+    Build the gradient texture for each palette color, as an (K, 8, 256, 4) uint8 array.
+
+    The texture gets transposed when drawn: texture.transpose(1,0,2)
+    After transpose: original width -> new height (U, along trail), original height -> new width (V, across ribbon)
+    So gradient along original WIDTH maps to U (along the trail path)
+    """
     tex_height = 8    # Across ribbon (becomes V after transpose)
     tex_width = 256   # Along trail (becomes U after transpose)
 
     # Gradient goes left-to-right (along width) = along trail after transpose
     # Empirically determined: left=opaque (head), right=transparent (tail)
-    trail_texture = rp.linear_gradient_image(
+    # Only the alpha ramp varies, so it is built once and every color is filled in
+    ramp = rp.linear_gradient_image(
         tex_height,  # height
         tex_width,   # width
         [
-            (rgba_float[0], rgba_float[1], rgba_float[2], 1.0),  # Left: opaque (head)
-            (rgba_float[0], rgba_float[1], rgba_float[2], 0.0),  # Right: transparent (tail)
+            (1.0, 1.0, 1.0, 1.0),  # Left: opaque (head)
+            (1.0, 1.0, 1.0, 0.0),  # Right: transparent (tail)
         ],
         direction='horizontal',
     )
-    trail_texture = rp.as_byte_image(trail_texture, copy=False)
-    trail_texture = rp.as_rgba_image(trail_texture, copy=False)
+    ramp = rp.as_rgba_image(rp.as_byte_image(ramp, copy=False), copy=False)
 
-    res_video = []
+    textures = np.empty((len(palette), tex_height, tex_width, 4), dtype=np.uint8)
+    textures[..., :3] = rp.as_byte_image(np.asarray(palette)[None, :, :3])[0, :, None, None]
+    textures[..., 3] = ramp[..., 3]
+    return textures
 
-    for t in tqdm(range(T), desc="Drawing Tracks (Skia)"):
-        # Create supersampled RGBA canvas from background frame
-        bg_frame = background[t]
-        if ss > 1:
-            bg_frame_ss = rp.resize_image(bg_frame, (H_ss, W_ss))
-        else:
-            bg_frame_ss = bg_frame
-        canvas = rp.as_rgba_image(bg_frame_ss, copy=True)
-
-        # Determine historical range for this frame
-        first_frame = max(0, t - trail_length) if trail_length > 0 else t
-        trail_start = first_frame
-        trail_end = t + 1
-        trail_length_actual = trail_end - trail_start
-
-        for i in range(N):
-            # Current position and visibility (scaled for supersampling)
-            x_now = tracks[t, i, 0] * ss
-            y_now = tracks[t, i, 1] * ss
-            is_visible_now = visible[t, i].item()
-
-            # Draw trail using skia_draw_trail
-            if trail_length > 0 and trail_length_actual >= 2:
-                # Collect visible points in the trail (scaled for supersampling)
-                points = []
-                for s in range(trail_start, trail_end):
-                    x_hist = tracks[s, i, 0] * ss
-                    y_hist = tracks[s, i, 1] * ss
-                    is_vis = visible[s, i].item()
-
-                    if is_vis and (x_hist != 0 or y_hist != 0):
-                        points.append([x_hist, y_hist])
-
-                if len(points) >= 2:
-                    contour = np.array(points, dtype=np.float32)
-
-                    # Resample for smoother rendering
-                    contour = rp.evenly_split_path(contour, max(len(contour) * 4, 20), loop=False)
-                    n_pts = len(contour)
-
-                    # Taper: inner/outer radius go from 0 at tail to actual_trail_size at head
-                    progress = np.linspace(0, 1, n_pts, dtype=np.float32)
-                    taper = progress ** 1.5
-                    radius = actual_trail_size * taper
-
-                    canvas = rp.skia_draw_trail(
-                        canvas,
-                        contour,
-                        trail_texture,
-                        thickness=None,
-                        alpha=1.0,
-                        loop=False,
-                        mode=None,
-                        copy=False,
-                        inner_radius=radius,
-                        outer_radius=radius,
-                        interp='bilinear',
-                        mipmap=False,
-                    )
-
-            # Draw current position dot using skia
-            if is_visible_now and 0 <= x_now < W_ss and 0 <= y_now < H_ss:
-                # Create skia surface from canvas
-                surface = skia.Surface.MakeRasterDirect(
-                    skia.ImageInfo.Make(W_ss, H_ss, skia.kRGBA_8888_ColorType, skia.kUnpremul_AlphaType),
-                    canvas
-                )
-                skia_canvas = surface.getCanvas()
 
-                # Fill
-                fill_paint = skia.Paint()
-                fill_paint.setAntiAlias(True)
-                fill_paint.setStyle(skia.Paint.kFill_Style)
-                fill_paint.setColor(skia.Color(int(r), int(g), int(b), 255))
-                skia_canvas.drawCircle(float(x_now), float(y_now), float(actual_dot_size), fill_paint)
+def _trail_paint(trail_texture, paint_cache=PAINT_CACHE):
+    """
+    Pooled paint that maps trail_texture along a trail ribbon, like rp.skia_draw_trail.
 
-                # Rim border
-                stroke_paint = skia.Paint()
-                stroke_paint.setAntiAlias(True)
-                stroke_paint.setStyle(skia.Paint.kStroke_Style)
-                stroke_paint.setStrokeWidth(actual_rim_thickness)
-                stroke_paint.setColor(skia.Color(rim_r, rim_g, rim_b, int(rim_opacity * 255)))
-                skia_canvas.drawCircle(float(x_now), float(y_now), float(actual_dot_size), stroke_paint)
-
-        # Downsample back to original resolution
-        if ss > 1:
-            canvas = rp.resize_image(canvas, (H, W))
-            canvas = rp.as_byte_image(canvas, copy=False)
+    The texture's width runs along the trail, so it is transposed to match
+    the ribbon's (along, across) vertex grid.
+    """
+    return paint_cache.get_textured(np.ascontiguousarray(trail_texture.transpose(1, 0, 2)))
 
-        res_video.append(canvas)
 
-    return np.array(res_video, dtype=np.uint8)
+@rp.memoized_lru(256)
+def _ribbon_grid(n, subdivs, tex_w, tex_h):
+    """
+    Texture coordinates and triangle indices for an n x subdivs ribbon grid.
+
+    Only depends on the grid and texture size, so it is shared by every
+    trail with the same number of resampled points.
+    """
+    import skia
+
+    u = np.linspace(0.0, 1.0, subdivs, dtype=np.float32)
+    v = np.linspace(0.0, 1.0, n, dtype=np.float32)
+    uu, vv = np.meshgrid(u, v, indexing='xy')
+    texcoords = np.stack([uu * tex_w, vv * tex_h], axis=-1).reshape(-1, 2)
+
+    v0 = np.arange(n - 1)[:, None] * subdivs + np.arange(subdivs - 1)[None, :]
+    v1 = v0 + 1
+    v3 = v0 + subdivs
+    v2 = v3 + 1
+    indices = np.stack([v0, v1, v2, v0, v2, v3], axis=-1).reshape(-1)
+
+    return [skia.Point(x, y) for x, y in texcoords.tolist()], indices.tolist()
+
+
+def _trail_vertices(contour, radius, texture_shape):
+    """
+    Build the textured ribbon rp.skia_draw_trail would draw for contour, as skia.Vertices.
+
+    The ribbon's rails are contour offset by radius on either side, with
+    RIBBON_SUBDIVS rows of vertices between them, so the same trail can be
+    drawn onto a canvas the caller already holds.
+    """
+    import skia
+
+    n = len(contour)
+    subdivs = RIBBON_SUBDIVS
+    while n * subdivs > MAX_RIBBON_VERTICES and subdivs > 2:
+        subdivs -= 1
+    if n * subdivs > MAX_RIBBON_VERTICES:
+        contour = rp.as_points_array(rp.resize_vector(rp.as_complex_vector(contour), 2**15))
+        n = len(contour)
+
+    radius = rp.resize_vector(radius, n, interp='linear')
+    center = rp.as_complex_vector(np.asarray(contour, dtype=np.float32))
+    outer = rp.dilate_contour(center, shift=-radius, loop=False)
+    inner = rp.dilate_contour(center, shift=radius, loop=False)
+    outer = np.column_stack([outer.real, outer.imag]).astype(np.float32)
+    inner = np.column_stack([inner.real, inner.imag]).astype(np.float32)
+
+    # Rows run from the inner rail to the outer rail, laid out (along, across)
+    t = np.linspace(0.0, 1.0, subdivs, dtype=np.float32)[None, :, None]
+    mesh = (1.0 - t) * inner[:, None, :] + t * outer[:, None, :]
+
+    # The transposed texture is texture_shape[0] wide (across) and texture_shape[1] tall (along)
+    texcoords, indices = _ribbon_grid(n, subdivs, texture_shape[0], texture_shape[1])
+    positions = [skia.Point(x, y) for x, y in mesh.reshape(-1, 2).tolist()]
+    return skia.Vertices.MakeCopy(skia.Vertices.kTriangles_VertexMode, positions, texcoords, None, indices)
+
+
+def _composite_overlay(overlay, ss, out_frame):
+    """
+    Shrink a supersampled unpremultiplied RGBA overlay by ss and draw it over out_frame.
+
+    The overlay is premultiplied before it is area-averaged, so transparent
+    pixels don't darken the edges of trails and dots, and Skia blends the
+    result over the background in one srcOver pass.
+    """
+    import skia
+
+    H, W = out_frame.shape[:2]
+    H_ss, W_ss = overlay.shape[:2]
+
+    premultiplied = np.empty_like(overlay)
+    skia.Image.fromarray(overlay, skia.kRGBA_8888_ColorType, skia.kUnpremul_AlphaType, copy=False).readPixels(
+        skia.ImageInfo.Make(W_ss, H_ss, skia.kRGBA_8888_ColorType, skia.kPremul_AlphaType),
+        premultiplied,
+        W_ss * 4,
+    )
+    premultiplied = np.ascontiguousarray(rp.cv_resize_image(premultiplied, (H, W), interp='area'))
+
+    surface = skia.Surface.MakeRasterDirect(
+        skia.ImageInfo.Make(W, H, skia.kRGBA_8888_ColorType, skia.kUnpremul_AlphaType),
+        out_frame
+    )
+    surface.getCanvas().drawImage(
+        skia.Image.fromarray(premultiplied, skia.kRGBA_8888_ColorType, skia.kPremul_AlphaType, copy=False), 0, 0
+    )
+    return out_frame
 
 
 def demo_skia():
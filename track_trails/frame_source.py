@@ -0,0 +1,74 @@
+"""
+Frame sources and output buffers for the track renderers.
+
+video and background may be arrays, lists of frames, or any iterable that
+yields frames one at a time (a generator, a video reader, ...). Iterables are
+consumed frame by frame and never materialized, so memory stays bounded.
+
+Frames are rendered straight into RGBA uint8 buffers, either slices of a
+caller-supplied out= array (which may be a np.memmap) or fresh arrays.
+"""
+
+import numpy as np
+from tqdm import tqdm
+
+import rp
+
+from .trail_window import TrailWindow
+
+
+def is_frame_stream(frames):
+    """True if frames is a lazy iterable rather than an array or list of frames."""
+    return frames is not None and not hasattr(frames, 'shape') and not isinstance(frames, (list, tuple))
+
+
+def check_output_buffer(out, T, frame_size=None):
+    """Validate a caller-supplied (T, H, W, 4) uint8 output buffer whose frames Skia can draw into."""
+    if out.dtype != np.uint8 or out.ndim != 4 or out.shape[0] != T or out.shape[3] != 4:
+        raise ValueError(f"out must be a ({T}, H, W, 4) uint8 array, but got shape={out.shape} dtype={out.dtype}")
+    if frame_size is not None and out.shape[1:3] != tuple(frame_size):
+        raise ValueError(f"out frames must be (H, W)={tuple(frame_size)}, but got shape={out.shape}")
+    if not out[:1].flags.c_contiguous:
+        raise ValueError("out must be C-contiguous so each frame can back a Skia surface")
+
+
+def copy_background(bg_frame, out_frame):
+    """Write a background frame into an RGBA uint8 frame buffer in one pass."""
+    if bg_frame.dtype == np.uint8 and bg_frame.ndim == 3 and bg_frame.shape[2] == 3:
+        out_frame[..., :3] = bg_frame
+        out_frame[..., 3] = 255
+    else:
+        out_frame[...] = rp.as_byte_image(rp.as_rgba_image(bg_frame, copy=False), copy=False)
+    return out_frame
+
+
+def iter_rendered_frames(render_frame, tracks, visible, background, paint_cache, desc, settings, out=None):
+    """
+    Yield render_frame's output for each frame, pulling background frames one at a time.
+
+    render_frame is called as render_frame(tracks, visible, bg_frame, t,
+    out_frame=out[t], trail_window=window, paint_cache=paint_cache, **settings),
+    like the workers of render_frames_parallel. Without out, each frame gets a
+    fresh buffer. One TrailWindow follows the frames so trails update incrementally.
+
+    Raises ValueError when background runs out before every frame of tracks is
+    drawn, which a lazy source can only reveal once it is exhausted.
+    """
+    T = len(tracks)
+    window = TrailWindow(tracks, visible, settings['trail_length'])
+    bg_frames = iter(background)
+    for t in tqdm(range(T), desc=desc):
+        bg_frame = next(bg_frames, None)
+        if bg_frame is None:
+            raise ValueError(f"video/background ran out after {t} frames, but tracks has {T}")
+        out_frame = out[t] if out is not None else None
+        yield render_frame(
+            tracks,
+            visible,
+            bg_frame,
+            t,
+            out_frame=out_frame,
+            trail_window=window,
+            paint_cache=paint_cache,
+            **settings,
+        )
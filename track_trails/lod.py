@@ -0,0 +1,82 @@
+"""
+Level-of-detail simplification for dense track grids.
+
+With dense CoTracker grids most trails are nearly straight or shorter than a
+pixel, yet every sample still costs TRAIL_SUBSTEPS segments in draw_tracks
+and four resampled vertices in draw_tracks_skia. The LOD stage collapses
+near-collinear samples with Douglas-Peucker, run on every trail at once, and
+drops trails too short to see, before anything is rendered.
+"""
+
+import numpy as np
+
+# Default Douglas-Peucker tolerance in output pixels
+LOD_TOLERANCE = 0.5
+
+# Trails with a shorter arc length, in output pixels, are not drawn
+MIN_TRAIL_LENGTH = 1.0
+
+
+def resolve_lod(lod):
+    """Turn a renderer's lod= argument into a tolerance in pixels, or None when disabled."""
+    if lod is None or lod is False:
+        return None
+    if lod is True:
+        return LOD_TOLERANCE
+    return float(lod)
+
+
+def simplify_trails(points, num_points, tolerance):
+    """
+    Douglas-Peucker simplify every trail in one vectorized pass.
+
+    All trails are refined together: each round splits every interval between
+    kept samples at its farthest sample, if that sample is more than
+    tolerance away from the interval's chord. Rounds repeat until no interval
+    splits, so the loop runs at most trail_length times regardless of N.
+
+    Args:
+        points: (N, L, 2) trail samples, oldest first (see TrailWindow.packed).
+        num_points: (N,) number of valid samples per track.
+        tolerance: Largest allowed distance, in pixels, between a dropped
+            sample and the simplified trail.
+
+    Returns:
+        (points, num_points, sample_index): the simplified trails packed the
+        same way, and the (N, L) original index of each kept sample.
+    """
+    N, L = points.shape[:2]
+    rows = np.arange(N)[:, None]
+    j = np.arange(L)
+    valid = j < num_points[:, None]
+    keep = valid & ((j == 0) | (j == num_points[:, None] - 1))
+
+    x = points[..., 0].astype(float)
+    y = points[..., 1].astype(float)
+
+    while True:
+        # The kept samples on either side of every sample
+        before = np.maximum.accumulate(np.where(keep, j, 0), axis=1)
+        after = np.minimum.accumulate(np.where(keep, j, L - 1)[:, ::-1], axis=1)[:, ::-1]
+
+        ax, ay = x[rows, before], y[rows, before]
+        dx, dy = x[rows, after] - ax, y[rows, after] - ay
+        chord = np.hypot(dx, dy)
+        distance = np.where(
+            chord > 0,
+            np.abs(dx * (y - ay) - dy * (x - ax)) / np.where(chord > 0, chord, 1),
+            np.hypot(x - ax, y - ay),
+        )
+        distance = np.where(valid & ~keep & (distance > tolerance), distance, -1)
+
+        # Split each interval at its farthest sample
+        farthest = np.full((N, L), -1.0)
+        np.maximum.at(farthest, (np.broadcast_to(rows, before.shape), before), distance)
+        split = (distance >= 0) & (distance == farthest[rows, before])
+        if not split.any():
+            break
+        keep |= split
+
+    sample_index = np.argsort(~keep, axis=1, kind='stable')
+    points = np.take_along_axis(points, sample_index[..., None], axis=1)
+    return points, keep.sum(axis=1), sample_index
@@ -0,0 +1,156 @@
+"""
+Shared skia.Paint pool for the track renderers.
+
+Track colors, rim colors and antialiasing never change during a render, and
+trail widths and alphas only take a handful of distinct values, so paints are
+built once and reused across points and frames instead of being allocated
+inside the hot loop.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import skia
+
+_STYLES = {
+    'fill': skia.Paint.kFill_Style,
+    'stroke': skia.Paint.kStroke_Style,
+}
+
+_CAPS = {
+    'butt': skia.Paint.kButt_Cap,
+    'round': skia.Paint.kRound_Cap,
+    'square': skia.Paint.kSquare_Cap,
+}
+
+
+class PaintCache:
+    """
+    Pool of antialiased skia.Paint objects keyed by (color, width, alpha, style, cap),
+    plus textured paints keyed by their texture (see get_textured).
+
+    Widths are bucketed to multiples of width_step (exact when None) and alphas
+    to whole bytes. Returned paints are shared, so callers must not mutate them,
+    except for the stroke width of paints fetched with width=None.
+
+    At most max_paints paints are kept; the least recently used are dropped
+    past it, so a long-lived pool (like PAINT_CACHE) stays bounded however
+    many distinct styles it has served.
+
+    Counters:
+        allocations: Number of skia.Paint objects created.
+        hits: Number of lookups served from the pool.
+        evictions: Number of paints dropped past max_paints.
+
+    Example:
+        >>> cache = PaintCache()
+        >>> fill = cache.get((0, 255, 0))
+        >>> fill is cache.get((0, 255, 0))
+        True
+        >>> cache.allocations, cache.hits
+        (1, 1)
+    """
+
+    def __init__(self, width_step=1 / 64, max_paints=4096):
+        self.width_step = width_step
+        self.max_paints = max_paints
+        self._paints = OrderedDict()
+        self.allocations = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        paint = self._paints.get(key)
+        if paint is not None:
+            self.hits += 1
+            self._paints.move_to_end(key)
+        return paint
+
+    def _store(self, key, paint):
+        self._paints[key] = paint
+        self.allocations += 1
+        while len(self._paints) > self.max_paints:
+            self._paints.popitem(last=False)
+            self.evictions += 1
+        return paint
+
+    def get(self, color, width=0, alpha=255, style='fill', cap='butt'):
+        """
+        Return the pooled paint for this style, creating it on first use.
+
+        Args:
+            color: Byte RGB tuple (r, g, b).
+            width: Stroke width in pixels (ignored by fill paints), or None
+                for a stroke paint whose width the caller sets with
+                setStrokeWidth before every draw. Trails taper through many
+                widths, so one such paint per (color, alpha) serves them all.
+            alpha: Opacity, 0-255.
+            style: 'fill' or 'stroke'.
+            cap: Stroke cap, 'butt', 'round' or 'square'.
+        """
+        if style == 'fill':
+            width = 0
+        elif width is not None and self.width_step and width > 0:
+            # Never round down to 0, which Skia draws as a 1-pixel hairline
+            width = max(round(width / self.width_step), 1) * self.width_step
+        key = (tuple(color), None if width is None else float(width), int(alpha), style, cap)
+
+        paint = self._lookup(key)
+        if paint is not None:
+            return paint
+
+        r, g, b = key[0]
+        paint = skia.Paint(
+            AntiAlias=True,
+            Style=_STYLES[style],
+            StrokeWidth=key[1] or 0,
+            StrokeCap=_CAPS[cap],
+            Color=skia.Color(int(r), int(g), int(b), key[2]),
+        )
+        return self._store(key, paint)
+
+    def get_textured(self, texture):
+        """
+        Return the pooled paint that samples texture, creating it on first use.
+
+        The paint draws texture with bilinear sampling and clamped edges.
+        Paints are keyed by the texture's contents, so the same colors and
+        gradient always share one shader.
+
+        Args:
+            texture: (h, w, 4) RGBA uint8 array.
+        """
+        key = ('texture', texture.shape, texture.tobytes())
+
+        paint = self._lookup(key)
+        if paint is not None:
+            return paint
+
+        image = skia.Image.fromarray(np.ascontiguousarray(texture), skia.kRGBA_8888_ColorType, skia.kUnpremul_AlphaType)
+        paint = skia.Paint(BlendMode=skia.BlendMode.kSrcOver)
+        paint.setShader(image.makeShader(skia.TileMode.kClamp, skia.TileMode.kClamp, skia.SamplingOptions(skia.FilterMode.kLinear)))
+        return self._store(key, paint)
+
+    def reset_counters(self):
+        """Zero the allocation, hit and eviction counters, keeping the pooled paints."""
+        self.allocations = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def clear(self):
+        """Drop every pooled paint and reset the counters."""
+        self._paints.clear()
+        self.reset_counters()
+
+    def __len__(self):
+        return len(self._paints)
+
+    def __repr__(self):
+        return (
+            f"PaintCache(paints={len(self)}, "
+            f"allocations={self.allocations}, hits={self.hits}, evictions={self.evictions})"
+        )
+
+
+# Default pool shared by draw_tracks and draw_tracks_skia
+PAINT_CACHE = PaintCache()
@@ -0,0 +1,163 @@
+"""
+Frame-parallel rendering for the track renderers.
+
+Every output frame depends only on the track arrays and one background frame,
+so frame ranges can be rendered by separate processes. Inputs are shared with
+the workers through shared memory (or reopened in place when they are already
+np.memmap files) instead of being pickled, as are array settings such as the
+(T, N) color indices and sizes, and each worker writes its frames straight
+into a shared output buffer, so frames come back in order.
+"""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+from tqdm import tqdm
+
+from .trail_window import TrailWindow
+
+# Chunks handed out per worker, so uneven frames still balance across the pool
+CHUNKS_PER_WORKER = 4
+
+
+def _is_file_backed(array):
+    """True if array is a whole, contiguous np.memmap that workers can reopen from its file."""
+    return isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.flags.c_contiguous
+
+
+def _share_array(array, blocks):
+    """
+    Describe an array so a worker can map it without copying.
+
+    File-backed np.memmap arrays are reopened from their file; anything else is
+    copied once into a new shared memory block, which is appended to blocks.
+    """
+    if _is_file_backed(array):
+        return ('memmap', array.filename, array.offset, array.shape, array.dtype.str)
+
+    array = np.asarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return ('shm', block.name, 0, array.shape, array.dtype.str)
+
+
+def _share_setting(array, blocks):
+    """
+    Describe an array setting for _attach_setting.
+
+    Broadcast views (such as the (T, N) sizes made from one size per track)
+    are shared at their compact size and broadcast again in the worker.
+    """
+    compact = array[tuple(slice(None) if stride else slice(0, 1) for stride in array.strides)]
+    return _share_array(compact, blocks), array.shape
+
+
+def _attach_setting(spec, blocks):
+    """Map an array setting described by _share_setting."""
+    array_spec, shape = spec
+    return np.broadcast_to(_attach_array(array_spec, blocks), shape)
+
+
+def _attach_array(spec, blocks, mode='r'):
+    """Map an array described by _share_array, keeping shared blocks alive in blocks."""
+    kind, name, offset, shape, dtype = spec
+    if kind == 'memmap':
+        return np.memmap(name, dtype=dtype, mode=mode, offset=offset, shape=shape)
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype, buffer=block.buf)
+
+
+def _render_chunk(render_frame, specs, out_spec, start, stop, settings, setting_specs):
+    """Worker entry point: render frames [start, stop) into the shared output."""
+    blocks = []
+    try:
+        tracks, visible, background = [_attach_array(spec, blocks) for spec in specs]
+        out = _attach_array(out_spec, blocks, mode='r+')
+        settings = settings | {name: _attach_setting(spec, blocks) for name, spec in setting_specs.items()}
+        window = TrailWindow(tracks, visible, settings['trail_length'])
+        for t in range(start, stop):
+            render_frame(tracks, visible, background[t], t, out_frame=out[t], trail_window=window, **settings)
+        del tracks, visible, background, out, settings, window
+    finally:
+        for block in blocks:
+            block.close()
+    return stop - start
+
+
+def render_frames_parallel(render_frame, tracks, visible, background, frame_shape, workers, desc=None, out=None, **settings):
+    """
+    Render every frame across a process pool and return them in order.
+
+    Args:
+        render_frame: Module-level function called in each worker as
+            render_frame(tracks, visible, background[t], t, out_frame=out[t],
+            trail_window=window, **settings) that draws one uint8 frame of shape
+            frame_shape into out_frame. settings must include trail_length.
+        tracks: (T, N, 2) track array.
+        visible: (T, N) visibility array.
+        background: (T, H, W, C) background frames.
+        frame_shape: Shape of one output frame, e.g. (H, W, 4).
+        workers: Number of processes. -1 uses every CPU.
+        desc: tqdm progress bar description.
+        out: Optional (T, *frame_shape) uint8 array to render into. A file-backed
+            np.memmap is written by the workers directly; anything else is filled
+            from the shared buffer at the end.
+        **settings: Keyword arguments forwarded to render_frame. Arrays are
+            shared like tracks; everything else must be picklable, and is
+            pickled for every chunk.
+
+    Returns:
+        numpy uint8 array of shape (T, *frame_shape), which is out if given.
+    """
+    if workers == -1:
+        workers = os.cpu_count()
+
+    T = len(tracks)
+    blocks = []
+    try:
+        specs = [_share_array(array, blocks) for array in (tracks, visible, background)]
+        setting_specs = {
+            name: _share_setting(value, blocks)
+            for name, value in settings.items() if isinstance(value, np.ndarray)
+        }
+        settings = {name: value for name, value in settings.items() if name not in setting_specs}
+
+        out_shape = (T, *frame_shape)
+        if out is not None and _is_file_backed(out):
+            out_spec = _share_array(out, blocks)
+        else:
+            out_block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(out_shape)), 1))
+            blocks.append(out_block)
+            out_spec = ('shm', out_block.name, 0, out_shape, np.dtype(np.uint8).str)
+
+        num_chunks = min(T, workers * CHUNKS_PER_WORKER)
+        bounds = np.linspace(0, T, num_chunks + 1).astype(int).tolist()
+
+        with ProcessPoolExecutor(workers) as pool, tqdm(total=T, desc=desc) as progress:
+            futures = [
+                pool.submit(_render_chunk, render_frame, specs, out_spec, start, stop, settings, setting_specs)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            for future in as_completed(futures):
+                progress.update(future.result())
+
+        if out_spec[0] == 'memmap':
+            out.flush()
+            return out
+
+        rendered = np.ndarray(out_shape, np.uint8, buffer=out_block.buf)
+        if out is None:
+            return rendered.copy()
+        out[...] = rendered
+        return out
+
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
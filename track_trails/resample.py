@@ -0,0 +1,65 @@
+"""
+Batched arc-length resampling of trails.
+
+rp.evenly_split_path resamples one path per call. resample_trails does the
+same for every trail of a frame at once: arc length is accumulated over the
+padded (N, L, 2) trail tensor and every output point is located with a
+single searchsorted over all trails.
+"""
+
+import numpy as np
+
+
+def resample_trails(points, num_points, num_out):
+    """
+    Resample every trail to evenly spaced points along its arc length.
+
+    Equivalent to rp.evenly_split_path(points[i, :num_points[i]], num_out[i])
+    for each track i, up to floating point rounding.
+
+    Args:
+        points: (N, L, 2) trail samples, oldest first (see TrailWindow.packed).
+        num_points: (N,) number of valid samples per track. Entries past
+            num_points[i] are ignored.
+        num_out: (N,) number of points to resample each trail to.
+
+    Returns:
+        (N, num_out.max(), 2) float64 array; row i holds num_out[i] points.
+        Tracks with fewer than two samples repeat their first sample.
+
+    Example:
+        >>> points, counts = window.packed()
+        >>> resampled = resample_trails(points, counts, np.maximum(counts * 4, 20))
+    """
+    N, L = points.shape[:2]
+    num_points = np.asarray(num_points)
+    num_out = np.broadcast_to(num_out, (N,))
+    if N == 0 or L == 0:
+        return np.zeros((N, int(num_out.max(initial=0)), 2))
+    rows = np.arange(N)[:, None]
+    points = points.astype(float)
+
+    # Cumulative arc length, flat past each trail's last sample
+    step = np.hypot(*np.diff(points, axis=1).transpose(2, 0, 1))
+    step[np.arange(1, L) >= num_points[:, None]] = 0
+    arc = np.concatenate([np.zeros((N, 1)), np.cumsum(step, axis=1)], axis=1)
+    total = arc[:, -1]
+
+    # Evenly spaced distances along each trail, like np.linspace(0, total, num_out)
+    M = int(num_out.max(initial=0))
+    k = np.arange(M)
+    spacing = total / np.maximum(num_out - 1, 1)
+    distance = np.where(k >= num_out[:, None] - 1, total[:, None], k * spacing[:, None])
+
+    # One searchsorted over all trails, each shifted past the previous one
+    offset = np.arange(N) * (total.max() + 1)
+    segment = np.searchsorted((arc + offset[:, None]).ravel(), (distance + offset[:, None]).ravel(), side='right')
+    segment = segment.reshape(N, M) - rows * L - 1
+    segment = np.clip(segment, 0, np.maximum(num_points - 2, 0)[:, None])
+
+    start = arc[rows, segment]
+    length = arc[rows, np.minimum(segment + 1, L - 1)] - start
+    t = np.where(length > 0, (distance - start) / np.where(length > 0, length, 1), 0)[..., None]
+    p0 = points[rows, segment]
+    p1 = points[rows, np.minimum(segment + 1, L - 1)]
+    return p0 + t * (p1 - p0)
@@ -0,0 +1,133 @@
+"""
+Batched triangle-mesh ribbons for the track renderers.
+
+rp.skia_draw_trail draws one textured ribbon per call, so a frame with
+thousands of tracks makes thousands of Python to Skia round trips. Here all
+of a frame's trails are turned into one vertex and index buffer with
+per-vertex colors, built with NumPy from the resampled contours and taper
+radii, and handed to Skia in as few drawVertices calls as its 16-bit
+indices allow.
+"""
+
+import numpy as np
+
+# Skia indexes vertices with 16 bits, so one draw holds at most this many
+MAX_RIBBON_VERTICES = 2**16
+
+
+def gradient_colors(texture, progress, index=None):
+    """
+    Sample a trail texture along the trail, as a textured ribbon would.
+
+    Args:
+        texture: (h, w, 4) uint8 RGBA texture whose width runs along the trail
+            and whose rows are identical (like draw_tracks_skia's gradient),
+            or a (K, h, w, 4) stack of them.
+        progress: (P,) position along each vertex's trail, 0 at the first
+            sample and 1 at the last.
+        index: (P,) texture of each vertex in a stack (default: the first).
+
+    Returns:
+        (P,) uint32 ARGB colors, as skia.Color packs them.
+    """
+    if texture.ndim == 3:
+        texture = texture[None]
+    if index is None:
+        index = np.zeros(len(progress), dtype=int)
+    rows = texture[:, texture.shape[1] // 2].astype(float)
+    width = rows.shape[1]
+
+    # Bilinear sampling with clamped edges, texel centers at half pixels
+    column = np.clip(progress * width - 0.5, 0, width - 1)
+    left = np.minimum(column.astype(int), width - 2)
+    fraction = (column - left)[:, None]
+    sampled = rows[index, left] * (1 - fraction) + rows[index, left + 1] * fraction + 0.5
+    r, g, b, a = sampled.T
+    return (a.astype(np.uint32) << 24) | (r.astype(np.uint32) << 16) | (g.astype(np.uint32) << 8) | b.astype(np.uint32)
+
+
+def ribbon_rails(points, radius, lengths):
+    """
+    Offset every trail by its radius on both sides, like rp.dilate_contour.
+
+    Args:
+        points: (P, 2) samples of every trail, concatenated.
+        radius: (P,) half-width of the ribbon at each sample.
+        lengths: (K,) number of samples in each trail (each at least 2).
+
+    Returns:
+        (inner, outer): (P, 2) float32 rails to the left and right of the trails.
+    """
+    center = points[:, 0] + 1j * points[:, 1].astype(float)
+    ends = np.cumsum(lengths) - 1
+    starts = ends - lengths + 1
+
+    # Average the deltas on either side of each sample, within its own trail
+    delta = np.diff(center)
+    delta[ends[:-1]] = 0
+    direction = np.zeros_like(center)
+    direction[:-1] += delta / 2
+    direction[1:] += delta / 2
+    direction[starts] *= 2
+    direction[ends] *= 2
+
+    norm = np.abs(direction)
+    normal = np.where(norm > 0, direction / np.where(norm > 0, norm, 1), 0) * -1j
+    inner = center + radius * normal
+    outer = center - radius * normal
+    return (
+        np.column_stack([inner.real, inner.imag]).astype(np.float32),
+        np.column_stack([outer.real, outer.imag]).astype(np.float32),
+    )
+
+
+def build_ribbons(points, radius, colors, lengths, max_vertices=MAX_RIBBON_VERTICES):
+    """
+    Build skia.Vertices for every trail of a frame at once.
+
+    Each sample becomes an inner and an outer vertex, and consecutive samples
+    of a trail are joined by two triangles. Triangles keep trail order, so
+    later trails, and later parts of each trail, are drawn on top.
+
+    Args:
+        points: (P, 2) samples of every trail, concatenated.
+        radius: (P,) half-width of the ribbon at each sample.
+        colors: (P,) uint32 ARGB color of each sample (see gradient_colors).
+        lengths: (K,) number of samples in each trail (each at least 2).
+        max_vertices: Most vertices per skia.Vertices.
+
+    Returns:
+        List of skia.Vertices, to be drawn in order with canvas.drawVertices.
+    """
+    import skia
+
+    if not len(lengths):
+        return []
+
+    inner, outer = ribbon_rails(points, radius, lengths)
+    positions = np.stack([inner, outer], axis=1).reshape(-1, 2)
+    colors = np.repeat(colors, 2)
+
+    # A quad joins samples q and q+1 unless q ends a trail
+    P = len(points)
+    joined = np.ones(P - 1, dtype=bool)
+    joined[np.cumsum(lengths)[:-1] - 1] = False
+
+    # Chunks of samples overlap by one, so quads never straddle two chunks
+    chunk = max_vertices // 2
+    vertices = []
+    for start in range(0, P - 1, chunk - 1):
+        stop = min(start + chunk, P)
+        quad = np.flatnonzero(joined[start:stop - 1])
+        if not len(quad):
+            continue
+        v0 = 2 * quad
+        indices = np.stack([v0, v0 + 1, v0 + 3, v0, v0 + 3, v0 + 2], axis=1).reshape(-1)
+        vertices.append(skia.Vertices.MakeCopy(
+            skia.Vertices.kTriangles_VertexMode,
+            [skia.Point(x, y) for x, y in positions[2 * start:2 * stop].tolist()],
+            None,
+            colors[2 * start:2 * stop].tolist(),
+            indices.tolist(),
+        ))
+    return vertices
@@ -0,0 +1,93 @@
+"""
+Per-track styles for the track renderers.
+
+color, dot_size and trail_size may be a single value, one value per track
+(N,) or one value per track per frame (T, N). They are resolved once per
+render: colors into a small palette plus a (T, N) index into it, sizes into
+a broadcast (T, N) view, so styling every track differently costs one array
+lookup per frame.
+"""
+
+import numpy as np
+
+import rp
+
+
+def is_single_color(color):
+    """True if color is one color spec (a name, hex code or RGB(A) tuple) rather than one per track."""
+    if isinstance(color, str):
+        return True
+    try:
+        array = np.asarray(color)
+    except ValueError:
+        return False
+    return array.ndim == 0 or (array.ndim == 1 and array.dtype.kind in 'iuf' and len(array) in (3, 4))
+
+
+def resolve_colors(color, T, N):
+    """
+    Resolve a color argument into a palette and a per-track, per-frame index.
+
+    Args:
+        color: One color spec for every track, a sequence of N specs, an
+            (N, 3|4) or (T, N, 3|4) array of float colors (or bytes if
+            integer), or a (T, N) array of specs. Specs are anything
+            rp.as_rgba_float_color accepts.
+        T, N: Number of frames and tracks.
+
+    Returns:
+        (palette, index): palette is a (K, 4) float RGBA array of the distinct
+        colors, and index is a (T, N) int array (possibly a broadcast view)
+        with each track's palette entry in each frame.
+    """
+    if is_single_color(color):
+        return np.array([rp.as_rgba_float_color(color)]), np.zeros((T, N), dtype=int)
+
+    try:
+        array = np.asarray(color)
+    except ValueError:
+        array = np.empty(len(color), dtype=object)
+        array[:] = list(color)
+
+    numeric = array.dtype.kind in 'iuf'
+    shape = array.shape[:-1] if numeric else array.shape
+    if shape not in [(N,), (T, N)] or (numeric and array.shape[-1] not in (3, 4)):
+        kind = "(N, 3|4) or (T, N, 3|4)" if numeric else "(N,) or (T, N)"
+        raise ValueError(f"Per-track colors must have shape {kind} with T={T}, N={N}, but got shape={array.shape}")
+
+    if numeric:
+        if array.dtype.kind in 'iu':
+            array = array / 255
+        if array.shape[-1] == 3:
+            array = np.concatenate([array, np.ones(shape + (1,))], axis=-1)
+        palette, index = np.unique(array.reshape(-1, 4), axis=0, return_inverse=True)
+    else:
+        specs = [spec if isinstance(spec, str) else tuple(spec) for spec in array.reshape(-1)]
+        unique = list(dict.fromkeys(specs))
+        position = {spec: i for i, spec in enumerate(unique)}
+        palette = np.array([rp.as_rgba_float_color(spec) for spec in unique])
+        index = np.array([position[spec] for spec in specs])
+
+    return palette, np.broadcast_to(index.reshape(shape), (T, N))
+
+
+def resolve_sizes(size, T, N, name='size'):
+    """
+    Resolve a size argument into a float, or a (T, N) float array (possibly a broadcast view).
+
+    Args:
+        size: A number for every track, or an (N,) or (T, N) array.
+        T, N: Number of frames and tracks.
+        name: Argument name for error messages.
+    """
+    if np.ndim(size) == 0:
+        return size
+    size = np.asarray(size, dtype=float)
+    if size.shape not in [(N,), (T, N)]:
+        raise ValueError(f"{name} must be a number or have shape (N,) or (T, N) with T={T}, N={N}, but got shape={size.shape}")
+    return np.broadcast_to(size, (T, N))
+
+
+def frame_sizes(size, t):
+    """Sizes of every track in frame t: the number itself, or row t of a (T, N) array."""
+    return size if np.ndim(size) == 0 else size[t]
@@ -0,0 +1,127 @@
+"""
+Incremental trail windows for the track renderers.
+
+Frame t draws each track's usable samples from frames [t-trail_length, t].
+Frame t+1 shares all but one of them, so instead of rescanning the window
+every frame, TrailWindow keeps a per-track ring buffer that adds the newest
+sample and drops the oldest, along with each sample's cumulative arc length
+and visible-run id. Advancing one frame is O(N) regardless of trail_length.
+"""
+
+import numpy as np
+
+
+class TrailWindow:
+    """
+    Sliding window over the last trail_length+1 frames of every track.
+
+    A sample is usable when it is visible and not at (0, 0); invisible samples
+    are skipped, so a trail joins the samples on either side of an occlusion.
+    Each usable sample remembers which visible run it belongs to, so callers
+    that want to break trails at occlusions can still do so.
+
+    Example:
+        >>> window = TrailWindow(tracks, visible, trail_length=10)
+        >>> for t in range(T):
+        ...     points, counts = window.seek(t).packed()
+        ...     # points[i, :counts[i]] is track i's trail, oldest first
+    """
+
+    def __init__(self, tracks, visible, trail_length):
+        self.tracks = tracks
+        self.visible = visible
+        self.trail_length = max(0, int(trail_length))
+        self.capacity = self.trail_length + 1
+
+        N = tracks.shape[1]
+        self._rows = np.arange(N)
+        self._points = np.zeros((N, self.capacity, 2), dtype=tracks.dtype)
+        self._frames = np.zeros((N, self.capacity), dtype=int)
+        self._arc = np.zeros((N, self.capacity))
+        self._runs = np.zeros((N, self.capacity), dtype=int)
+        self.reset()
+
+    def reset(self):
+        """Empty the window."""
+        N = len(self._rows)
+        self.t = None
+        self.counts = np.zeros(N, dtype=int)
+        self._start = np.zeros(N, dtype=int)
+        self._total_arc = np.zeros(N)
+        self._num_runs = np.zeros(N, dtype=int)
+        self._last_frame = np.full(N, -2)
+
+    def seek(self, t):
+        """
+        Move the window so it ends at frame t.
+
+        Stepping to t+1 is incremental; any other jump refills the window from
+        frame t-trail_length. Returns self.
+        """
+        if t == self.t:
+            return self
+        if self.t is None or t != self.t + 1:
+            self.reset()
+            for s in range(max(0, t - self.trail_length), t):
+                self._push(s)
+        self._push(t)
+        return self
+
+    def _push(self, t):
+        """Drop the sample that falls out of the window and add frame t's samples."""
+        cap = self.capacity
+
+        # At most one sample per track leaves the window per frame
+        oldest = self._frames[self._rows, self._start]
+        expired = (self.counts > 0) & (oldest < t - self.trail_length)
+        self._start[expired] = (self._start[expired] + 1) % cap
+        self.counts[expired] -= 1
+
+        xy = self.tracks[t]
+        usable = self.visible[t].astype(bool) & ((xy[:, 0] != 0) | (xy[:, 1] != 0))
+        i = np.flatnonzero(usable)
+
+        slot = (self._start[i] + self.counts[i]) % cap
+        previous = self._points[i, (slot - 1) % cap]
+        step = np.hypot(*(xy[i] - previous).T)
+        self._total_arc[i] += np.where(self.counts[i] > 0, step, 0)
+
+        # A sample starts a new visible run unless the previous frame was usable too
+        self._num_runs[i] += self._last_frame[i] != t - 1
+        self._last_frame[i] = t
+
+        self._points[i, slot] = xy[i]
+        self._frames[i, slot] = t
+        self._arc[i, slot] = self._total_arc[i]
+        self._runs[i, slot] = self._num_runs[i]
+        self.counts[i] += 1
+        self.t = t
+
+    def _packed_index(self):
+        return (self._start[:, None] + np.arange(self.capacity)) % self.capacity
+
+    def packed(self):
+        """
+        Every track's samples, oldest first.
+
+        Returns:
+            (points, counts): points is (N, trail_length+1, 2) and points[i, :counts[i]]
+            are track i's usable samples. Entries past counts[i] are stale.
+        """
+        index = self._packed_index()
+        return np.take_along_axis(self._points, index[..., None], axis=1), self.counts
+
+    def arc_lengths(self):
+        """(N, trail_length+1) arc length from each track's oldest sample, aligned with packed()."""
+        arc = np.take_along_axis(self._arc, self._packed_index(), axis=1)
+        return arc - arc[:, :1]
+
+    def lengths(self):
+        """(N,) total arc length of each track's trail."""
+        last = (self._start + np.maximum(self.counts - 1, 0)) % self.capacity
+        return self._arc[self._rows, last] - self._arc[self._rows, self._start]
+
+    def run_ids(self):
+        """(N, trail_length+1) visible-run index of each sample within the window, aligned with packed()."""
+        runs = np.take_along_axis(self._runs, self._packed_index(), axis=1)
+        return runs - runs[:, :1]